@@ -1,11 +1,21 @@
 # agent/agent.py
 from __future__ import annotations
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import copy
+import hashlib
+import json
 import os
+import re
+import threading
+import weakref
+import numpy as np
 from openai import OpenAI
 
+from agent.intents import Route, keyword_scanner, route
 from agent.tools import TOOL_SPECS, dispatch
-from agent.rag import retrieve
+from agent.data import entity_names
+from agent.rag import embed_query, normalize_query, retrieve
 
 _SYSTEM = """\
 You are a finance copilot that answers CFO questions from monthly CSV data.
@@ -15,7 +25,16 @@ Never guess numbers; tools compute all values. Keep answers concise and board-re
 """
 
 _MODEL = os.getenv("OPENAI_MODEL", "gpt-5-mini")  # pick a model that supports tools
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+_CLIENT = None
+_API_KEY = os.getenv("OPENAI_API_KEY")
+
+
+def _client() -> Optional[OpenAI]:
+    # Created on first use and reused, so every call shares one connection pool
+    global _CLIENT
+    if _CLIENT is None and _API_KEY:
+        _CLIENT = OpenAI(api_key=_API_KEY)
+    return _CLIENT
 
 
 def _extract_tool_use(resp) -> Tuple[Optional[str], Dict[str, Any]]:
@@ -47,52 +66,138 @@ def _extract_tool_use(resp) -> Tuple[Optional[str], Dict[str, Any]]:
     return None, {}
 
 
-def _heuristic_tool(question: str) -> str:
+def _tool_use_from_event(event) -> Tuple[Optional[str], Dict[str, Any]]:
     """
-    If the model didn't call a tool, pick one heuristically so we still answer.
+    Extract a tool call from one Responses stream event, if that event completes one.
+    Returns (tool_name, args) or (None, {}).
     """
-    q = (question or "").lower()
-    
+    if getattr(event, "type", "") != "response.output_item.done":
+        return None, {}
+    item = getattr(event, "item", None)
+    kind = getattr(item, "type", "")
+    if kind == "function_call":
+        try:
+            args = json.loads(getattr(item, "arguments", "") or "{}")
+        except ValueError:
+            args = {}
+        return getattr(item, "name", None), (args if isinstance(args, dict) else {})
+    if kind == "tool_use":
+        return getattr(item, "name", None), (getattr(item, "input", {}) or {})
+    return None, {}
+
+
+# Fallback routing rules, checked in order; one scan of the question feeds all of them
+_HEURISTIC_ROUTES: List[Route] = [
     # Revenue analysis (comprehensive)
-    if "revenue" in q and ("total" in q or "overall" in q or "how much" in q or "analysis" in q or "performance" in q):
-        return "revenue_analysis"
+    ("revenue_analysis", [frozenset({"revenue"}), frozenset({"total", "overall", "how much", "analysis", "performance"})]),
     # Revenue vs budget (specific comparison)
-    if "revenue" in q and "budget" in q:
-        return "revenue_vs_budget"
-    
+    ("revenue_vs_budget", [frozenset({"revenue"}), frozenset({"budget"})]),
     # Margin analysis
-    if "gross margin" in q or "gm%" in q or "gm %" in q or "margin" in q:
-        return "gm_trend"
-    
+    ("gm_trend", [frozenset({"gross margin", "gm%", "gm %", "margin"})]),
     # Expense analysis
-    if ("marketing" in q or "sales" in q or "r&d" in q or "admin" in q or "opex" in q) and ("spend" in q or "spent" in q or "cost" in q or "expense" in q or "breakdown" in q or "by category" in q):
-        return "opex_breakdown"
-    
+    ("opex_breakdown", [frozenset({"marketing", "sales", "r&d", "admin", "opex"}),
+                        frozenset({"spend", "spent", "cost", "expense", "breakdown", "by category"})]),
     # Financial performance (comprehensive)
-    if ("performance" in q or "dashboard" in q or "summary" in q or "overview" in q) and ("financial" in q or "business" in q or "company" in q):
-        return "financial_performance"
-    
+    ("financial_performance", [frozenset({"performance", "dashboard", "summary", "overview"}),
+                               frozenset({"financial", "business", "company"})]),
     # Cash analysis
-    if "runway" in q or ("cash" in q and ("runway" in q or "burn" in q)):
-        return "cash_runway"
-    
+    ("cash_runway", [frozenset({"runway"})]),
+    ("cash_runway", [frozenset({"cash"}), frozenset({"burn"})]),
     # Dataset questions
-    if "how many months" in q or "months of data" in q or "which months" in q or "what months" in q or "dataset" in q:
-        return "data_coverage"
-    
+    ("data_coverage", [frozenset({"how many months", "months of data", "which months", "what months", "dataset"})]),
     # General expense questions
-    if "spend" in q or "spent" in q or "cost" in q or "expense" in q:
-        return "opex_breakdown"
-    
+    ("opex_breakdown", [frozenset({"spend", "spent", "cost", "expense"})]),
     # Revenue questions (catch remaining)
-    if "revenue" in q:
-        return "revenue_analysis"
-    
-    # Default to data coverage for meta questions
-    return "data_coverage"
+    ("revenue_analysis", [frozenset({"revenue"})]),
+]
+_HEURISTIC_SCANNER = keyword_scanner(
+    re.escape(k) for _, groups in _HEURISTIC_ROUTES for g in groups for k in g
+)
+
+
+def _heuristic_tool(question: str) -> str:
+    """
+    If the model didn't call a tool, pick one heuristically so we still answer.
+    Defaults to data coverage for meta questions.
+    """
+    return route((question or "").lower(), _HEURISTIC_SCANNER, _HEURISTIC_ROUTES, "data_coverage")
+
+
+# ---------- Result cache ----------
+# LRU of recent answers keyed on the normalized question. Entries remember the exact
+# fin/cash frames they were computed from, so new or reloaded data never hits.
+# Streamlit runs each session in its own thread, so every access holds the lock, and
+# callers get their own copy of a cached answer.
+_RESULT_CACHE_SIZE = 128
+_RESULT_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_RESULT_LOCK = threading.Lock()
+_SEMANTIC_THRESHOLD = 0.95
+# Tokens a paraphrase must keep verbatim: numbers, months/quarters, routing keywords
+_DETAIL_RX = re.compile(r"\d+|q[1-4]\b|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec")
+
+
+def _question_signature(question: str, fin) -> FrozenSet[str]:
+    q = normalize_query(question)
+    entities = {str(e).lower() for e in entity_names(fin)}
+    return frozenset(
+        set(_DETAIL_RX.findall(q))
+        | {" ".join(h.split()) for h in _HEURISTIC_SCANNER.findall(q)}
+        | {e for e in entities if e in q}
+    )
+
+
+def _cached_result(key: str, qv: np.ndarray, sig: FrozenSet[str], fin, cash) -> Optional[Dict[str, Any]]:
+    with _RESULT_LOCK:
+        out = _lookup_result(key, qv, sig, fin, cash)
+    return copy.deepcopy(out) if out is not None else None
+
+
+def _lookup_result(key: str, qv: np.ndarray, sig: FrozenSet[str], fin, cash) -> Optional[Dict[str, Any]]:
+    # Caller holds _RESULT_LOCK
+    def same_data(entry):
+        return entry["fin"]() is fin and entry["cash"]() is cash
+
+    entry = _RESULT_CACHE.get(key)
+    if entry is not None and same_data(entry):
+        _RESULT_CACHE.move_to_end(key)
+        return entry["out"]
+
+    # Semantic hit: a near-identical question about the same periods/metrics/entities
+    candidates = [(k, e) for k, e in _RESULT_CACHE.items() if e["sig"] == sig and same_data(e)]
+    if not candidates:
+        return None
+    sims = np.stack([e["qv"] for _, e in candidates]) @ qv
+    best = int(sims.argmax())
+    if sims[best] <= _SEMANTIC_THRESHOLD:
+        return None
+    hit_key, hit = candidates[best]
+    _RESULT_CACHE.move_to_end(hit_key)
+    return hit["out"]
+
+
+def _store_result(key: str, qv: np.ndarray, sig: FrozenSet[str], fin, cash, out: Dict[str, Any]) -> None:
+    # Store a private copy, so the caller mutating its answer can't reach the cache
+    entry = {
+        "qv": qv, "sig": sig, "out": copy.deepcopy(out),
+        "fin": weakref.ref(fin), "cash": weakref.ref(cash),
+    }
+    with _RESULT_LOCK:
+        _RESULT_CACHE[key] = entry
+        _RESULT_CACHE.move_to_end(key)
+        while len(_RESULT_CACHE) > _RESULT_CACHE_SIZE:
+            _RESULT_CACHE.popitem(last=False)
 
 
 def run_agent(question: str, fin, cash, kb) -> Dict[str, Any]:
+    # Repeated (or reworded) questions on the same data are answered from cache
+    key = hashlib.sha1(normalize_query(question).encode()).hexdigest()
+    qv = embed_query(question)
+    qv = qv / (np.linalg.norm(qv) + 1e-8)
+    sig = _question_signature(question, fin)
+    cached = _cached_result(key, qv, sig, fin, cash)
+    if cached is not None:
+        return cached
+
     # Retrieve a bit of context (schema, tool docs, coverage, examples)
     context = retrieve(kb, question, k=3)
     msgs = [
@@ -103,23 +208,35 @@ def run_agent(question: str, fin, cash, kb) -> Dict[str, Any]:
         {"role": "user", "content": question or ""},
     ]
 
-    # Call Responses API with proper tool schema
+    # Stream the Responses API call and stop as soon as a tool call is complete;
+    # the rest of the generation isn't needed to dispatch
     try:
-        resp = client.responses.create(
+        cli = _client()
+        if cli is None:
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        with cli.responses.stream(
             model=_MODEL,
             input=msgs,
             tools=TOOL_SPECS,
-        )
+        ) as stream:
+            for event in stream:
+                name, args = _tool_use_from_event(event)
+                if name:
+                    break  # leaving the block closes the stream
+            else:
+                # No tool event seen; look at the assembled response (robustly)
+                name, args = _extract_tool_use(stream.get_final_response())
     except Exception as e:
-        # If the API call fails entirely, fall back heuristically
+        # If the API call fails entirely, fall back heuristically (not cached, so the LLM is retried)
         name = _heuristic_tool(question)
         result = dispatch(name, {}, fin, cash, question, entity=None)
         return {"tool": name, "result": result, "note": f"LLM call failed: {e}"}
 
-    # Extract tool call (robustly). If none, fall back.
-    name, args = _extract_tool_use(resp)
+    # No tool call at all: fall back.
     if not name:
         name = _heuristic_tool(question)
 
     result = dispatch(name, args, fin, cash, question, entity=None)
-    return {"tool": name, "result": result}
+    out = {"tool": name, "result": result}
+    _store_result(key, qv, sig, fin, cash, out)
+    return out
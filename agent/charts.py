@@ -1,16 +1,18 @@
 from __future__ import annotations
 from typing import List, Dict
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
 
-def fmt_usd(x: float) -> str:
-    sign = '-' if x < 0 else ''
-    x = abs(x)
-    if x >= 1_000_000:
-        return f"{sign}${x/1_000_000:.1f}M"
-    if x >= 1_000:
-        return f"{sign}${x/1_000:.1f}K"
-    return f"{sign}${x:,.0f}"
+from agent.metrics import fmt_usd  # re-exported; lives in metrics so the tools don't pull in Plotly
+
+# Layout defaults shared by the charts; figures only set what differs. Merged onto the stock
+# "plotly" template once here so colors and fonts are unchanged, and installed as the default
+# because Plotly caches the default template (a per-figure template= is re-merged every time).
+pio.templates["fpna"] = pio.templates.merge_templates("plotly", go.layout.Template(layout=dict(
+    xaxis=dict(title='Month'),
+)))
+pio.templates.default = "fpna"
 
 def revenue_vs_budget_fig(actual: float, budget: float, month: pd.Period, for_print: bool = False):
     fig = go.Figure()
@@ -39,14 +41,14 @@ def revenue_vs_budget_fig(actual: float, budget: float, month: pd.Period, for_pr
 def gm_trend_fig(gm_pct: pd.Series, for_print: bool = False):
     fig = go.Figure()
     fig.add_scatter(
-        x=[str(m) for m in gm_pct.index],
+        x=gm_pct.index.astype(str),
         y=(gm_pct * 100.0),
         mode='lines+markers',
         name='GM %',
         line=dict(dash='dash' if for_print else None),
         marker=dict(symbol='diamond' if for_print else 'circle', size=8)
     )
-    fig.update_layout(title='Gross Margin % Trend', xaxis_title='Month', yaxis_title='GM %')
+    fig.update_layout(title='Gross Margin % Trend', yaxis_title='GM %')
     return fig
 
 def opex_breakdown_fig(ser: pd.Series, month: pd.Period):
@@ -78,25 +80,26 @@ def cash_trend_fig(cash_df: pd.DataFrame, for_print: bool = False):
     s = cash_df.sort_values('month').set_index('month')['amount_usd']
     fig = go.Figure()
     fig.add_scatter(
-        x=[str(m) for m in s.index],
+        x=s.index.astype(str),
         y=s.values,
         mode='lines+markers',
         name='Cash (USD)',
         line=dict(dash='dot' if for_print else None),
         marker=dict(symbol='square' if for_print else 'circle', size=7)
     )
-    fig.update_layout(title='Cash Balance Trend', xaxis_title='Month', yaxis_title='USD')
+    fig.update_layout(title='Cash Balance Trend', yaxis_title='USD')
     return fig
 def dataset_overview_fig(fin_df: pd.DataFrame, cash_df: pd.DataFrame, for_print: bool = False):
     """Comprehensive overview chart showing revenue trends and cash balance"""
     fig = go.Figure()
     
     # Revenue trend (actual vs budget)
-    revenue_data = fin_df[fin_df['account_category'] == 'Revenue'].groupby(['month', 'source'])['amount_usd'].sum().unstack(fill_value=0)
+    revenue_data = fin_df[fin_df['account_category'] == 'Revenue'].groupby(['month', 'source'], observed=True)['amount_usd'].sum().unstack(fill_value=0)
+    months = revenue_data.index.astype(str)
     
     if 'actuals' in revenue_data.columns:
         fig.add_scatter(
-            x=[str(m) for m in revenue_data.index],
+            x=months,
             y=revenue_data['actuals'].values,
             mode='lines+markers',
             name='Revenue (Actual)',
@@ -107,7 +110,7 @@ def dataset_overview_fig(fin_df: pd.DataFrame, cash_df: pd.DataFrame, for_print:
     
     if 'budget' in revenue_data.columns:
         fig.add_scatter(
-            x=[str(m) for m in revenue_data.index],
+            x=months,
             y=revenue_data['budget'].values,
             mode='lines+markers',
             name='Revenue (Budget)',
@@ -116,10 +119,10 @@ def dataset_overview_fig(fin_df: pd.DataFrame, cash_df: pd.DataFrame, for_print:
             yaxis='y1'
         )
     
-    # Cash balance trend on secondary y-axis
-    cash_sorted = cash_df.sort_values('month')
+    # Cash balance trend on secondary y-axis (normalized cash is already month-ordered)
+    cash_sorted = cash_df if cash_df['month'].is_monotonic_increasing else cash_df.sort_values('month')
     fig.add_scatter(
-        x=[str(m) for m in cash_sorted['month']],
+        x=cash_sorted['month'].astype(str).to_numpy(),
         y=cash_sorted['amount_usd'].values,
         mode='lines+markers',
         name='Cash Balance',
@@ -131,7 +134,6 @@ def dataset_overview_fig(fin_df: pd.DataFrame, cash_df: pd.DataFrame, for_print:
     # Update layout with dual y-axes
     fig.update_layout(
         title='Financial Overview: Revenue Trends & Cash Balance',
-        xaxis_title='Month',
         yaxis=dict(
             title='Revenue (USD)',
             side='left',
@@ -172,7 +174,6 @@ def category_trend_fig(category: str, data_points: List[Dict], for_print: bool =
     
     fig.update_layout(
         title=f'{category} Spend Trend Over Time',
-        xaxis_title='Month',
         yaxis_title='USD',
         hovermode='x'
     )
@@ -213,7 +214,6 @@ def revenue_trend_fig(data_points: List[Dict], for_print: bool = False):
     
     fig.update_layout(
         title='Revenue Trend Analysis',
-        xaxis_title='Month',
         yaxis_title='Revenue (USD)',
         hovermode='x unified',
         legend=dict(x=0.01, y=0.99)
@@ -1,22 +1,47 @@
 from __future__ import annotations
+import weakref
+from dataclasses import dataclass
+from typing import Any
+import numpy as np
 import pandas as pd
-from dateutil.parser import parse as dtparse
+
+# Account-category types, stored as the int8 `cat_type` column on normalized financials
+CAT_REV, CAT_COGS, CAT_OPEX, CAT_OTHER = 0, 1, 2, 3
+
+def category_types(account_category: pd.Series) -> np.ndarray:
+    # Classify each distinct category name once, then broadcast through the codes
+    cat = account_category.astype('category')
+    names = cat.cat.categories.astype(str)
+    per_cat = np.select(
+        [
+            (names == 'Revenue') | names.str.startswith('Revenue:'),
+            (names == 'COGS') | names.str.startswith('COGS:'),
+            names.str.startswith('Opex:'),
+        ],
+        [CAT_REV, CAT_COGS, CAT_OPEX],
+        CAT_OTHER,
+    ).astype(np.int8)
+    codes = cat.cat.codes.to_numpy()
+    return np.where(codes >= 0, per_cat[codes], CAT_OTHER).astype(np.int8)
+
+def row_category_types(df: pd.DataFrame) -> np.ndarray:
+    # Per-row category types: the `cat_type` column set by normalize(), or classified
+    # on the fly for frames built elsewhere. `== CAT_OPEX` is the Opex row mask.
+    if 'cat_type' in df:
+        return df['cat_type'].to_numpy()
+    return category_types(df['account_category'])
 
 def _to_period(s: pd.Series) -> pd.Series:
     # Robust month coercion: accepts 'YYYY-MM', 'YYYY-MM-DD', 'Jun 2025', etc.
-    def coerce(x):
-        if pd.isna(x):
-            return pd.NaT
-        x = str(x)
-        try:
-            # Fast path: YYYY-MM
-            if len(x) == 7 and x[4] == '-':
-                return pd.Period(x, freq='M')
-            # Fallback general parser
-            return pd.Period(dtparse(x).strftime('%Y-%m'), freq='M')
-        except Exception:
-            return pd.NaT
-    return s.map(coerce)
+    # Whole-column parses; unparseable cells become NaT.
+    s = s.astype('string')
+    # Fast path: YYYY-MM
+    out = pd.to_datetime(s, format='%Y-%m', errors='coerce')
+    # Fallback general parser for whatever the fast path missed
+    slow = out.isna() & s.notna()
+    if slow.any():
+        out[slow] = pd.to_datetime(s[slow], format='mixed', errors='coerce')
+    return out.dt.to_period('M')
 
 def load_from_xlsx(path_or_url: str) -> dict[str, pd.DataFrame]:
     xls = pd.ExcelFile(path_or_url)
@@ -32,7 +57,14 @@ def load_from_csv_dir(csv_dir: str) -> dict[str, pd.DataFrame]:
         dfs[name] = pd.read_csv(f)
     return dfs
 
-def normalize(dfs: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+# Columns normalize() adds to the financials for internal filtering; not part of the user-facing schema
+DERIVED_COLUMNS = frozenset({'cat_type', 'month_ord', 'year'})
+
+def normalize(dfs: dict[str, pd.DataFrame]) -> dict[str, Any]:
+    """
+    Returns 'financials' (the long USD table), 'cash' (month-ordered cash balances),
+    'pivot' (financials_pivot of the financials) and 'months' (the sorted month Series).
+    """
     actuals = dfs['actuals'].copy()
     budget = dfs['budget'].copy()
     fx = dfs['fx'].copy()
@@ -42,25 +74,173 @@ def normalize(dfs: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
     for d in (actuals, budget, fx, cash):
         d['month'] = _to_period(d['month'])
 
-    # FX normalization
+    # FX normalization: one (month, currency) -> rate lookup, no merged frames
+    fx_map = fx.set_index(['month','currency'])['rate_to_usd']
+    if fx_map.index.duplicated().any():
+        dupes = fx_map.index[fx_map.index.duplicated()].unique()
+        raise ValueError(f"Duplicate FX rate_to_usd for (month, currency): {list(dupes)}")
     for d in (actuals, budget):
         if 'currency' not in d.columns:
             d['currency'] = 'USD'
-        merged = d.merge(fx, on=['month','currency'], how='left', validate='m:1')
-        if merged['rate_to_usd'].isna().any():
-            missing = merged[merged['rate_to_usd'].isna()][['month','currency']].drop_duplicates()
+        rates = fx_map.reindex(pd.MultiIndex.from_arrays([d['month'], d['currency']])).to_numpy(dtype=float)
+        if np.isnan(rates).any():
+            missing = d.loc[np.isnan(rates), ['month','currency']].drop_duplicates()
             raise ValueError(f"Missing FX rate_to_usd for rows:\n{missing}" )
-        d['amount_usd'] = (merged['amount'] * merged['rate_to_usd']).astype(float)
+        d['amount_usd'] = d['amount'].to_numpy(dtype=float) * rates
+
+    # Canonical long table, assembled column by column (no intermediate long frames)
+    def stack(col: str) -> np.ndarray:
+        return np.concatenate([actuals[col].to_numpy(), budget[col].to_numpy()])
+
+    month_ords = np.concatenate([actuals['month'].array.asi8, budget['month'].array.asi8])
+    combined = pd.DataFrame({
+        'month': pd.PeriodIndex.from_ordinals(month_ords, freq='M'),
+        'entity': pd.Categorical(stack('entity')),
+        'account_category': pd.Categorical(stack('account_category')),
+        'amount_usd': stack('amount_usd'),
+        'source': pd.Categorical.from_codes(
+            np.repeat(np.array([0, 1], dtype=np.int8), [len(actuals), len(budget)]),
+            categories=['actuals', 'budget'],
+        ),
+    })
+    # Month-ordered rows: month groupings downstream come out sorted without sorting again
+    order = np.lexsort((combined['account_category'].cat.codes, combined['source'].cat.codes, month_ords))
+    combined = combined.take(order).reset_index(drop=True)
+    month_ords = month_ords[order]
+    combined['cat_type'] = category_types(combined['account_category'])
+    # Integer month ordinals for month filters, and the calendar year for year filters
+    # (0 where the month is missing); monthly ordinal 0 is 1970-01
+    combined['month_ord'] = month_ords
+    combined['year'] = np.where(month_ords == pd.NaT.value, 0, month_ords // 12 + 1970).astype(np.int16)
+
+    # Cash already in USD; kept in month order so the first/last rows are the period bounds
+    cash = cash.rename(columns={'cash_usd':'amount_usd'}).sort_values('month', kind='stable', ignore_index=True)
+    cash['entity'] = cash['entity'].astype('category')
+
+    return {
+        'financials': combined,
+        'cash': cash,
+        'pivot': financials_pivot(combined),
+        'months': get_available_months(combined),
+    }
+
+# Per-frame derived data is memoized by frame id (frames are treated as read-only once normalized)
+_PIVOTS: dict[int, pd.DataFrame] = {}
+_MONTH_TOTALS: dict[int, pd.DataFrame] = {}
+_COUNTS: dict[int, pd.DataFrame] = {}
+_MONTHS: dict[int, pd.Series] = {}
+_CATEGORY_COLUMNS: dict[int, dict[int, pd.Index]] = {}
+_ACTUALS: dict[int, pd.DataFrame] = {}
+_PARTITIONS: dict[int, dict[str, pd.DataFrame]] = {}
+_CASH_BOUNDS: dict[int, tuple[float, float]] = {}
+_ENTITY_NAMES: dict[int, tuple[str, ...]] = {}
 
-    # Canonical long table
-    actuals_long = actuals.assign(source='actuals')[[ 'month','entity','account_category','amount_usd','source' ]]
-    budget_long  = budget.assign(source='budget')[[  'month','entity','account_category','amount_usd','source' ]]
-    combined = pd.concat([actuals_long, budget_long], ignore_index=True)
+def _memo(store: dict, fin: pd.DataFrame, build):
+    key = id(fin)
+    value = store.get(key)
+    if value is None:
+        value = store[key] = build(fin)
+        weakref.finalize(fin, store.pop, key, None)
+    return value
 
-    # Cash already in USD
-    cash = cash.rename(columns={'cash_usd':'amount_usd'})
+def financials_pivot(fin: pd.DataFrame) -> pd.DataFrame:
+    """
+    Amounts summed to (month, source, entity) rows x account_category columns.
+    Built once per frame and reused by the metrics.
+    """
+    return _memo(_PIVOTS, fin, lambda f: (
+        f.groupby(['month', 'source', 'entity', 'account_category'], observed=True, dropna=False)['amount_usd']
+        .sum()
+        .unstack('account_category', fill_value=0.0)
+        .sort_index()
+    ))
 
-    return {'financials': combined, 'cash': cash}
+def category_counts(fin: pd.DataFrame) -> pd.DataFrame:
+    """
+    Row counts on the pivot's (month, source, entity) x account_category grid, so callers
+    can tell a category with no rows (zero-filled in the pivot) from one that nets to 0.
+    """
+    return _memo(_COUNTS, fin, lambda f: (
+        f.groupby(['month', 'source', 'entity', 'account_category'], observed=True, dropna=False)
+        .size()
+        .unstack('account_category', fill_value=0)
+        .sort_index()
+    ))
+
+def month_totals(fin: pd.DataFrame) -> pd.DataFrame:
+    """
+    The pivot summed across entities: (month, source) rows x account_category columns,
+    so whole-company month lookups read one row. Built once per frame.
+    """
+    return _memo(_MONTH_TOTALS, fin, lambda f: (
+        financials_pivot(f).groupby(level=['month', 'source'], sort=False, observed=True).sum()
+    ))
+
+def category_columns(fin: pd.DataFrame) -> dict[int, pd.Index]:
+    """Pivot columns grouped by category type (CAT_REV, CAT_COGS, ...), classified once per frame."""
+    def build(f: pd.DataFrame) -> dict[int, pd.Index]:
+        cols = financials_pivot(f).columns
+        types = category_types(pd.Series(cols))
+        return {t: cols[types == t] for t in (CAT_REV, CAT_COGS, CAT_OPEX, CAT_OTHER)}
+    return _memo(_CATEGORY_COLUMNS, fin, build)
+
+def actuals_rows(fin: pd.DataFrame) -> pd.DataFrame:
+    """Actuals rows of the frame, selected once per frame. Read-only, like the frame itself."""
+    return _memo(_ACTUALS, fin, lambda f: f[f['source'] == 'actuals'])
+
+def source_partitions(fin: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Rows of each source ('actuals', 'budget') indexed by a sorted (account_category, month)
+    MultiIndex, split once per frame so category/month filters are .loc slices.
+    """
+    return _memo(_PARTITIONS, fin, lambda f: {
+        str(src): rows.set_index(['account_category', 'month']).sort_index()
+        for src, rows in f.groupby('source', sort=False, observed=True)
+    })
+
+def cash_bounds(cash: pd.DataFrame) -> tuple[float, float]:
+    """(first, last) cash balance of the month-ordered cash frame, (0, 0) when empty; read once per frame."""
+    def build(c: pd.DataFrame) -> tuple[float, float]:
+        if c.empty:
+            return 0.0, 0.0
+        amounts = c['amount_usd']
+        return float(amounts.iat[0]), float(amounts.iat[-1])
+    return _memo(_CASH_BOUNDS, cash, build)
+
+def _sorted_months(fin: pd.DataFrame) -> pd.Series:
+    # Sort only the distinct months, not the whole column
+    if not isinstance(fin['month'].dtype, pd.PeriodDtype):
+        return fin['month'].dropna().drop_duplicates().sort_values().reset_index(drop=True)
+    ords = np.unique(fin['month'].array.asi8)
+    ords = ords[ords != pd.NaT.value]
+    return pd.Series(pd.PeriodIndex.from_ordinals(ords, freq='M'), name='month')
 
 def get_available_months(fin_combined: pd.DataFrame) -> pd.Series:
-    return fin_combined['month'].dropna().drop_duplicates().sort_values()
+    """Sorted distinct months of the frame, computed once per frame."""
+    return _memo(_MONTHS, fin_combined, _sorted_months)
+
+def entity_names(fin: pd.DataFrame) -> tuple[str, ...]:
+    """Sorted distinct entity names of the frame, computed once per frame."""
+    return _memo(_ENTITY_NAMES, fin, lambda f: tuple(sorted(f['entity'].dropna().unique().tolist())))
+
+@dataclass(frozen=True, eq=False)
+class SessionContext:
+    """
+    Values the tools derive from the session's (read-only) financials and cash frames.
+    Each field is memoized per frame, so building one is a handful of dict lookups.
+    """
+    months: pd.Series
+    actuals: pd.DataFrame
+    entity_names: tuple[str, ...]
+    cash_start: float
+    cash_end: float
+
+def session_context(fin: pd.DataFrame, cash: pd.DataFrame) -> SessionContext:
+    cash_start, cash_end = cash_bounds(cash)
+    return SessionContext(
+        months=get_available_months(fin),
+        actuals=actuals_rows(fin),
+        entity_names=entity_names(fin),
+        cash_start=cash_start,
+        cash_end=cash_end,
+    )
@@ -1,30 +1,37 @@
 from __future__ import annotations
 import re
+from typing import Iterable, Sequence, Tuple, FrozenSet
 
-INTENTS = [
-    ('revenue_vs_budget', re.compile(r'(revenue).*?(vs|versus).*?(budget)|revenue\s+vs\s+budget', re.I)),
-    ('gm_trend',          re.compile(r'(gross\s*margin|gm).*(trend|last|past)', re.I)),
-    ('opex_breakdown',    re.compile(r'(opex|operating\s*exp).*?(breakdown|by\s*category)', re.I)),
-    ('cash_runway',       re.compile(r'cash.*runway|runway', re.I)),
-]
+# A route fires when the text hits at least one phrase from every group
+Route = Tuple[str, Sequence[FrozenSet[str]]]
 
-def classify(text: str) -> str:
-    t = (text or "").lower()
+def keyword_scanner(patterns: Iterable[str]) -> re.Pattern:
+    """
+    Compile trigger patterns into one lookahead alternation, so findall() reports
+    every hit (overlapping ones included) in a single pass over the text.
+    """
+    alts = sorted(patterns, key=len, reverse=True)
+    return re.compile("(?=(" + "|".join(alts) + "))")
 
-    # NEW: data coverage / dataset info
-    if re.search(r"\bmonths?\s+of\s+data\b", t) or re.search(r"\bhow many months\b", t):
-        return "data_coverage"
-    if "what months" in t or "which months" in t:
-        return "data_coverage"
+def route(text: str, scanner: re.Pattern, routes: Sequence[Route], default: str) -> str:
+    hits = {" ".join(h.split()) for h in scanner.findall(text)}
+    for name, groups in routes:
+        if all(hits & g for g in groups):
+            return name
+    return default
 
-    # existing rules…
-    if "revenue" in t and "budget" in t:
-        return "revenue_vs_budget"
-    if "gross margin" in t or "gm%" in t or "gm %" in t:
-        return "gm_trend"
-    if "opex" in t and ("breakdown" in t or "by category" in t):
-        return "opex_breakdown"
-    if "runway" in t:
-        return "cash_runway"
+_ROUTES: Sequence[Route] = [
+    # data coverage / dataset info
+    ('data_coverage',     [frozenset({'months of data', 'month of data', 'how many months', 'what months', 'which months'})]),
+    ('revenue_vs_budget', [frozenset({'revenue'}), frozenset({'budget'})]),
+    ('gm_trend',          [frozenset({'gross margin', 'gm%', 'gm %'})]),
+    ('opex_breakdown',    [frozenset({'opex'}), frozenset({'breakdown', 'by category'})]),
+    ('cash_runway',       [frozenset({'runway'})]),
+]
+_SCANNER = keyword_scanner([
+    r'\bmonths?\s+of\s+data\b', r'\bhow many months\b', 'what months', 'which months',
+    'revenue', 'budget', 'gross margin', 'gm%', 'gm %', 'opex', 'breakdown', 'by category', 'runway',
+])
 
-    return "unknown"
\ No newline at end of file
+def classify(text: str) -> str:
+    return route((text or "").lower(), _SCANNER, _ROUTES, "unknown")
@@ -2,67 +2,95 @@ from __future__ import annotations
 import pandas as pd
 import numpy as np
 
+from agent.data import CAT_REV, CAT_COGS, CAT_OPEX, category_columns, category_counts, financials_pivot, month_totals
+
 REV_KEYS = ('Revenue', 'Revenue:')
 COGS_KEYS = ('COGS', 'COGS:')
 OPEX_PREFIX = 'Opex:'
 
-def _is_rev(s: pd.Series) -> pd.Series:
-    return s.eq('Revenue') | s.str.startswith('Revenue:')
+def fmt_usd(x: float) -> str:
+    sign = '-' if x < 0 else ''
+    x = abs(x)
+    if x >= 1_000_000:
+        return f"{sign}${x/1_000_000:.1f}M"
+    if x >= 1_000:
+        return f"{sign}${x/1_000:.1f}K"
+    return f"{sign}${x:,.0f}"
+
+def _lookup(table: pd.DataFrame, key) -> pd.DataFrame:
+    # Sorted-MultiIndex lookup; a missing key just means no rows
+    try:
+        rows = table.loc[key]
+    except KeyError:
+        return table.iloc[:0]
+    return rows.to_frame().T if isinstance(rows, pd.Series) else rows
 
-def _is_cogs(s: pd.Series) -> pd.Series:
-    return s.eq('COGS') | s.str.startswith('COGS:')
+def _rows(fin: pd.DataFrame, month, source: str, entity: str | None=None) -> pd.DataFrame:
+    # Without an entity the entity-summed table answers with a single row
+    if entity:
+        return _lookup(financials_pivot(fin), (month, source, entity))
+    return _lookup(month_totals(fin), (month, source))
 
-def _is_opex(s: pd.Series) -> pd.Series:
-    return s.str.startswith('Opex:')
+def _actuals_by_month(fin: pd.DataFrame, months, entity: str | None=None) -> pd.DataFrame:
+    # Month x account_category actuals, summed across entities unless one is given
+    pivot = financials_pivot(fin)
+    # Sorted-MultiIndex lookup (a binary search per month) instead of a mask over every row;
+    # get_locs raises on absent labels, so keep only months the pivot has
+    wanted = pivot.index.levels[0].intersection(pd.Index(months))
+    key = [wanted, 'actuals', entity] if entity else [wanted, 'actuals']
+    try:
+        rows = pivot.iloc[pivot.index.get_locs(key)] if len(wanted) else pivot.iloc[:0]
+    except KeyError:
+        rows = pivot.iloc[:0]
+    # Positions come back in index order, so sort=False already yields months in order
+    return rows.groupby(level='month', sort=False).sum()
 
 def revenue_month(fin: pd.DataFrame, month, entity: str | None=None):
-    f = fin[fin['month'] == month]
-    if entity:
-        f = f[f['entity'] == entity]
-    actual = f[(f['source']=='actuals') & _is_rev(f['account_category'])]['amount_usd'].sum()
-    budget = f[(f['source']=='budget')  & _is_rev(f['account_category'])]['amount_usd'].sum()
+    rev_cols = category_columns(fin)[CAT_REV]
+    actual = _rows(fin, month, 'actuals', entity)[rev_cols].to_numpy().sum()
+    budget = _rows(fin, month, 'budget', entity)[rev_cols].to_numpy().sum()
     delta = actual - budget
     delta_pct = (delta / budget) if budget != 0 else np.nan
     return float(actual), float(budget), float(delta), (float(delta_pct) if pd.notna(delta_pct) else np.nan)
 
 def gross_margin_pct_series(fin: pd.DataFrame, months: pd.Series, entity: str | None=None) -> pd.Series:
     # Uses actuals only
-    f = fin[(fin['source']=='actuals') & (fin['month'].isin(months))]
-    if entity:
-        f = f[f['entity'] == entity]
-    grp = f.groupby('month')
-    rev = grp.apply(lambda df: df[_is_rev(df['account_category'])]['amount_usd'].sum())
-    cogs = grp.apply(lambda df: df[_is_cogs(df['account_category'])]['amount_usd'].sum())
+    a = _actuals_by_month(fin, months, entity)
+    cols = category_columns(fin)
+    rev = a[cols[CAT_REV]].sum(axis=1)
+    cogs = a[cols[CAT_COGS]].sum(axis=1)
     gm = (rev - cogs)
     with np.errstate(divide='ignore', invalid='ignore'):
         gm_pct = gm / rev.replace(0, np.nan)
-    return gm_pct.sort_index()
+    return gm_pct
 
 def opex_breakdown_month(fin: pd.DataFrame, month, entity: str | None=None) -> pd.Series:
-    f = fin[(fin['source']=='actuals') & (fin['month']==month)]
-    if entity:
-        f = f[f['entity']==entity]
-    opex = f[f['account_category'].str.startswith('Opex:')]
-    ser = opex.groupby('account_category')['amount_usd'].sum().sort_values(ascending=False)
+    # One row lookup on the pivot, restricted to the Opex columns classified at load
+    opex = category_columns(fin)[CAT_OPEX]
+    ser = _rows(fin, month, 'actuals', entity)[opex].sum()
+    # The pivot zero-fills categories with no rows this month; leave those out by row count,
+    # so a category whose rows net to 0 is still listed
+    key = (month, 'actuals', entity) if entity else (month, 'actuals')
+    present = _lookup(category_counts(fin), key)[opex].to_numpy().sum(axis=0) > 0
+    ser = ser[present].sort_values(ascending=False)
     return ser
 
 def ebitda_series(fin: pd.DataFrame, months: pd.Series, entity: str | None=None) -> pd.Series:
-    f = fin[(fin['source']=='actuals') & (fin['month'].isin(months))]
-    if entity:
-        f = f[f['entity']==entity]
-    grp = f.groupby('month')
-    rev = grp.apply(lambda df: df[_is_rev(df['account_category'])]['amount_usd'].sum())
-    cogs = grp.apply(lambda df: df[_is_cogs(df['account_category'])]['amount_usd'].sum())
-    opex = grp.apply(lambda df: df[df['account_category'].str.startswith('Opex:')]['amount_usd'].sum())
-    e = (rev - cogs - opex).sort_index()
+    a = _actuals_by_month(fin, months, entity)
+    cols = category_columns(fin)
+    rev = a[cols[CAT_REV]].sum(axis=1)
+    cogs = a[cols[CAT_COGS]].sum(axis=1)
+    opex = a[cols[CAT_OPEX]].sum(axis=1)
+    e = (rev - cogs - opex)
     return e
 
 def cash_runway(cash_df: pd.DataFrame, ebitda_recent3: pd.Series) -> float | float('inf'):
-    if ebitda_recent3.empty:
+    # Plain NumPy on the raw arrays; this runs once per question
+    ebitda = ebitda_recent3.to_numpy(dtype=np.float64)
+    if ebitda.size == 0:
         return float('inf')
-    burns = ebitda_recent3.apply(lambda x: max(0.0, -float(x)))
-    avg_burn = burns.tail(3).mean()
-    latest_cash = cash_df.sort_values('month')['amount_usd'].iloc[-1]
-    if avg_burn == 0 or pd.isna(avg_burn):
+    avg_burn = np.fmax(0.0, -ebitda[-3:]).mean()  # burn = max(0, -EBITDA); NaN counts as 0
+    if avg_burn == 0 or np.isnan(avg_burn):
         return float('inf')
+    latest_cash = cash_df['amount_usd'].iat[cash_df['month'].argmax()]
     return float(latest_cash / avg_burn)
@@ -1,52 +1,116 @@
 from __future__ import annotations
 import re
 import calendar
+from functools import lru_cache
+from typing import Optional, Tuple
 import pandas as pd
-from dateutil.parser import parse as dtparse
+
+# Month word -> month number, keyed on the 3-letter prefix ("sept", "june" -> "sep", "jun")
+_MONTH_NUM = {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+_MONTH_WORD = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
 
 # e.g., "June 2025"
-MONTH_RX = re.compile(r"\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*)\s+(\d{4})\b", re.I)
+MONTH_RX = re.compile(rf"\b({_MONTH_WORD})\s+(\d{{4}})\b", re.I)
+
+# Every explicit period form in one pattern; the named group says which one matched
+_PERIOD_RX = re.compile(
+    r"(?P<last_n>last\s+(?P<n>\d+)\s+months?)"
+    r"|(?P<quarter>q(?P<q>[1-4])\s*(?P<q_year>\d{4}))"
+    rf"|(?P<named>\b(?P<name>{_MONTH_WORD})\s+(?P<name_year>\d{{4}})\b)"
+    r"|(?P<iso>(?P<iso_year>20\d{2})[-/](?P<iso_month>0[1-9]|1[0-2]))",
+    re.I,
+)
+# Which form wins when a question contains several (lower = higher priority)
+_PERIOD_PRIORITY = {"last_n": 0, "quarter": 1, "named": 2, "iso": 3}
+
+# Lone month names; the lookahead also reports overlapping hits
+_LONE_MONTH_RX = re.compile(r"(?=(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec))")
 
 def parse_months(text: str, available_months: pd.Series) -> pd.Series | None:
     t = (text or "").lower()
     am = available_months.sort_values()
 
-    # last N months
-    m = re.search(r"last\s+(\d+)\s+months?", t)
-    if m:
-        n = int(m.group(1))
-        return am.tail(n)
-
-    # quarter like Q2 2025
-    mq = re.search(r"q([1-4])\s*(\d{4})", t)
-    if mq:
-        q = int(mq.group(1)); y = int(mq.group(2))
-        start = (q - 1) * 3 + 1
-        months = [pd.Period(f"{y}-{m:02d}", freq="M") for m in range(start, start + 3)]
-        return pd.Series(months)
-
-    # named month + year
-    mm = MONTH_RX.search(text or "")
-    if mm:
-        p = pd.Period(dtparse(mm.group(0)).strftime("%Y-%m"), freq="M")
-        return pd.Series([p])
-
-    # ISO like 2025-06 or 2025/06
-    mi = re.search(r"(20\d{2})[-/](0[1-9]|1[0-2])", t)
-    if mi:
-        y = int(mi.group(1)); m2 = mi.group(2)
-        p = pd.Period(f"{y}-{m2}", freq="M")
+    best = min(_PERIOD_RX.finditer(t), key=lambda m: _PERIOD_PRIORITY[m.lastgroup], default=None)
+    if best is not None:
+        kind = best.lastgroup
+        # last N months
+        if kind == "last_n":
+            return am.tail(int(best.group("n")))
+        # quarter like Q2 2025
+        if kind == "quarter":
+            q = int(best.group("q")); y = int(best.group("q_year"))
+            start = (q - 1) * 3 + 1
+            return pd.Series(pd.period_range(f"{y}-{start:02d}", periods=3, freq="M"))
+        # named month + year
+        if kind == "named":
+            m = _MONTH_NUM[best.group("name")[:3]]
+            return pd.Series([pd.Period(f"{best.group('name_year')}-{m:02d}", freq="M")])
+        # ISO like 2025-06 or 2025/06
+        p = pd.Period(f"{best.group('iso_year')}-{best.group('iso_month')}", freq="M")
         return pd.Series([p])
 
     # Lone month name (e.g., "June") → latest occurrence of that month number in data
-    for i, name in enumerate(calendar.month_name[1:], start=1):
-        if name.lower() in t or name[:3].lower() in t:
-            candidates = am[am.dt.month == i]
-            if not candidates.empty:
-                return pd.Series([candidates.max()])
+    for i in sorted({_MONTH_NUM[name] for name in _LONE_MONTH_RX.findall(t)}):
+        candidates = am[am.dt.month == i]
+        if not candidates.empty:
+            return pd.Series([candidates.max()])
 
     # this month / current month / right now → latest available month
     if "this month" in t or "current month" in t or "right now" in t:
         return pd.Series([am.max()])
 
     return None
+
+# Everything the spend/revenue tools look for in a question (opex category, target month/year),
+# scanned in one pass; the named group says which kind of token matched
+_QUESTION_RX = re.compile(
+    r'(?P<category>marketing|sales|r&d|admin)'
+    r'|\b(?P<month_year>(?P<name>January|February|March|April|May|June|July|August|September|October|November|December'
+    r'|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\s+(?P<name_year>20\d{2}))\b'
+    r'|\b(?P<iso>(?P<iso_year>20\d{2})[-/](?P<iso_month>\d{1,2}))\b'
+    r'|\b(?P<year>20\d{2})\b',
+    re.IGNORECASE,
+)
+# Opex category named in the question (first listed wins when several are)
+_OPEX_CATEGORIES = {"marketing": "Marketing", "sales": "Sales", "r&d": "R&D", "admin": "Admin"}
+_CATEGORY_PRIORITY = {k: i for i, k in enumerate(_OPEX_CATEGORIES)}
+
+TargetPeriod = Tuple[Optional[pd.Period], Optional[int], Optional[int]]
+
+@lru_cache(maxsize=256)
+def scan_question(question: str) -> Tuple[Optional[str], TargetPeriod]:
+    """
+    Opex category and target period named in the question, from a single regex scan
+    (cached per question string, so tools called for the same question share it).
+    The period is (period, year, month): "January 2025" wins over "2025-01" / "2025/01",
+    which wins over a bare year (period and month stay None).
+    """
+    categories, month_year, iso, years = [], None, None, []
+    for m in _QUESTION_RX.finditer(question or ""):
+        kind = m.lastgroup
+        if kind == "category":
+            categories.append(m.group(kind).lower())
+        elif kind == "month_year":
+            month_year = month_year or m
+        elif kind == "iso":
+            iso = iso or m
+            years.append(int(m.group("iso_year")))
+        else:
+            years.append(int(m.group("year")))
+
+    category = _OPEX_CATEGORIES[min(categories, key=_CATEGORY_PRIORITY.get)] if categories else None
+    if month_year:
+        year, month = int(month_year.group("name_year")), _MONTH_NUM[month_year.group("name")[:3].lower()]
+    elif iso and 1 <= int(iso.group("iso_month")) <= 12:
+        # Only the first ISO date counts; an out-of-range one ("2025-13") falls back to the first year
+        year, month = int(iso.group("iso_year")), int(iso.group("iso_month"))
+    else:
+        return category, (None, years[0] if years else None, None)
+    return category, (pd.Period(f"{year}-{month:02d}", freq="M"), year, month)
+
+def parse_target_period(question: str) -> TargetPeriod:
+    """Month or year named in the question, as (period, year, month)."""
+    return scan_question(question)[1]
@@ -1,36 +1,44 @@
 from __future__ import annotations
 from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 import plotly.graph_objects as go
-import tempfile, os
+import plotly.io as pio
+from concurrent.futures import ThreadPoolExecutor
+import io
+from typing import BinaryIO
 
-def _save_fig_png(fig: go.Figure) -> str:
-    # Requires kaleido installed
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-    tmp.close()
-    fig.write_image(tmp.name, scale=2)
-    return tmp.name
+# Requires kaleido installed. One long-lived scope renders every page at 2x.
+if pio.kaleido.scope is not None:
+    pio.kaleido.scope.default_scale = 2
 
-def export_board_pack(pdf_path: str, title: str, blocks: list[tuple[str, go.Figure]]):
+def _save_fig_png(fig: go.Figure) -> io.BytesIO:
+    # PNG bytes stay in memory; ReportLab reads them straight from the buffer
+    buf = io.BytesIO(fig.to_image(format='png', engine='kaleido'))
+    buf.seek(0)
+    return buf
+
+def export_board_pack(pdf_path: str | BinaryIO, title: str, blocks: list[tuple[str, go.Figure]]):
+    # pdf_path may also be a writable binary buffer (e.g. io.BytesIO)
     c = canvas.Canvas(pdf_path, pagesize=LETTER)
     width, height = LETTER
     margin = 0.75*inch
 
-    for page_title, fig in blocks:
+    # Render every chart up front, concurrently; the canvas itself is drawn in order
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(blocks)))) as ex:
+        images = list(ex.map(lambda block: _save_fig_png(block[1]), blocks))
+
+    for (page_title, _), png in zip(blocks, images):
         c.setFont('Helvetica-Bold', 16)
         c.drawString(margin, height - margin, title)
         c.setFont('Helvetica', 12)
         c.drawString(margin, height - margin - 18, page_title)
 
-        img_path = _save_fig_png(fig)
-        try:
-            # Fit image into area
-            img_w, img_h = 7.0*inch, 4.2*inch
-            c.drawImage(img_path, margin, height - margin - 18 - img_h - 12, width=img_w, height=img_h, preserveAspectRatio=True, anchor='nw')
-        finally:
-            try: os.remove(img_path)
-            except: pass
+        img = ImageReader(png)
+        # Fit image into area
+        img_w, img_h = 7.0*inch, 4.2*inch
+        c.drawImage(img, margin, height - margin - 18 - img_h - 12, width=img_w, height=img_h, preserveAspectRatio=True, anchor='nw')
 
         c.showPage()
 
@@ -1,29 +1,132 @@
 # agent/rag.py
 from __future__ import annotations
+from collections import OrderedDict
 from typing import List, Dict
+import atexit
+import hashlib
 import os
+import re
+import threading
 import numpy as np
 import pandas as pd
 from openai import OpenAI
 
-from agent.data import get_available_months
+from agent.data import DERIVED_COLUMNS, get_available_months
 
 _EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+# Embeddings are written to disk only when these are set; otherwise they live for the process
+_QUERY_CACHE_PATH = os.getenv("FPNA_QUERY_CACHE") or None
+_QUERY_CACHE_SIZE = 2048
+_KB_CACHE_DIR = os.getenv("FPNA_KB_CACHE_DIR") or None
+# Store KB embeddings as per-row int8 (4x smaller); fp32 stays the default
+_KB_INT8 = os.getenv("FPNA_KB_INT8", "").lower() in ("1", "true", "yes")
+
+# One client per process so embedding calls reuse its pooled keep-alive connections
+_CLIENT = None
+
+def _client() -> OpenAI:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _CLIENT
 
 def _embed_texts(texts: List[str]) -> np.ndarray:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    resp = client.embeddings.create(model=_EMBED_MODEL, input=texts)
+    resp = _client().embeddings.create(model=_EMBED_MODEL, input=texts)
     vecs = [d.embedding for d in resp.data]
     return np.array(vecs, dtype=np.float32)
 
-def _cosine_sim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
-    a = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-8)
-    b = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-8)
-    return a @ b.T
+# LRU of query embeddings keyed by sha1(model + normalized query), capped at
+# _QUERY_CACHE_SIZE and persisted on exit as keys + one array (no pickle, like the KB cache).
+def _load_query_cache() -> "OrderedDict[str, np.ndarray]":
+    if not _QUERY_CACHE_PATH:
+        return OrderedDict()
+    try:
+        with np.load(_QUERY_CACHE_PATH, allow_pickle=False) as cached:
+            keys, embs = cached["keys"], cached["embs"]
+        return OrderedDict(zip(keys.tolist()[-_QUERY_CACHE_SIZE:], embs[-_QUERY_CACHE_SIZE:]))
+    except Exception:
+        return OrderedDict()
+
+_QUERY_CACHE: "OrderedDict[str, np.ndarray]" = _load_query_cache()
+_QUERY_CACHE_DIRTY = False
+# Streamlit sessions run in their own threads
+_QUERY_LOCK = threading.Lock()
+
+def _remember_queries(items) -> None:
+    # Caller holds _QUERY_LOCK
+    global _QUERY_CACHE_DIRTY
+    for key, vec in items:
+        _QUERY_CACHE[key] = vec
+        _QUERY_CACHE.move_to_end(key)
+    while len(_QUERY_CACHE) > _QUERY_CACHE_SIZE:
+        _QUERY_CACHE.popitem(last=False)
+    _QUERY_CACHE_DIRTY = True
+
+@atexit.register
+def _save_query_cache() -> None:
+    if not _QUERY_CACHE_DIRTY or not _QUERY_CACHE_PATH:
+        return
+    try:
+        with _QUERY_LOCK:
+            items = list(_QUERY_CACHE.items())
+        # One array needs one width; entries from another embedding model are dropped
+        dim = items[-1][1].shape
+        items = [(k, v) for k, v in items if v.shape == dim]
+        # A file object, so np.savez doesn't append ".npz" to a custom path
+        with open(_QUERY_CACHE_PATH, "wb") as f:
+            np.savez(f, keys=np.array([k for k, _ in items]), embs=np.stack([v for _, v in items]))
+    except Exception:
+        pass
+
+def normalize_query(query: str) -> str:
+    # Near-duplicates ("What is our runway?" / "what is our runway") normalize alike:
+    # case, punctuation and whitespace don't move the embedding enough to matter here.
+    return " ".join(re.sub(r"[^\w%&$]+", " ", (query or "").lower()).split())
+
+def _query_key(query: str) -> str:
+    return hashlib.sha1(f"{_EMBED_MODEL}\n{normalize_query(query)}".encode()).hexdigest()
+
+def embed_query(query: str) -> np.ndarray:
+    """Embedding of one question, served from the on-disk cache when possible."""
+    key = _query_key(query)
+    with _QUERY_LOCK:
+        vec = _QUERY_CACHE.get(key)
+        if vec is not None:
+            _QUERY_CACHE.move_to_end(key)
+            return vec
+    vec = _embed_texts([query])[0]
+    with _QUERY_LOCK:
+        _remember_queries([(key, vec)])
+    return vec
+
+def _unit_rows(a: np.ndarray) -> np.ndarray:
+    return a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-8)
+
+def _quantize_rows(embs: np.ndarray) -> Dict[str, np.ndarray]:
+    # Symmetric per-row int8: embs ~= embs_q * scales[:, None]
+    scales = np.abs(embs).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    embs_q = np.round(embs / scales[:, None]).astype(np.int8)
+    return {"embs_q": embs_q, "scales": scales.astype(np.float32)}
+
+def _kb_sims(kb: Dict, qv: np.ndarray) -> np.ndarray:
+    # Cosine scores of unit query rows against the KB (int8 or fp32 storage)
+    if "embs_q" in kb:
+        return (qv @ kb["embs_q"].T) * kb["scales"]
+    return qv @ kb["embs"].T
+
+def _top_k(sims: np.ndarray, k: int) -> np.ndarray:
+    # Row-wise indices of the k best scores, best first (argpartition, then sort only k)
+    k = max(0, min(k, sims.shape[1]))
+    if k == 0:
+        return np.empty((sims.shape[0], 0), dtype=np.intp)
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
 
 def build_kb(fin: pd.DataFrame, cash: pd.DataFrame) -> Dict:
     months = get_available_months(fin)
-    schema = sorted(fin.columns.tolist())
+    schema = sorted(c for c in fin.columns if c not in DERIVED_COLUMNS)
     entities = sorted(fin["entity"].dropna().unique().tolist())
 
     docs = []
@@ -44,11 +147,60 @@ def build_kb(fin: pd.DataFrame, cash: pd.DataFrame) -> Dict:
     ]
     docs.append("Example questions: " + " | ".join(examples))
 
-    embs = _embed_texts(docs)
+    # Unit-normalized once here, so retrieval is a plain dot product per question
+    embs = _unit_rows(_load_or_embed_docs(docs))
+    if _KB_INT8:
+        return {"docs": docs, **_quantize_rows(embs)}
     return {"docs": docs, "embs": embs}
 
+def _load_or_embed_docs(docs: List[str]) -> np.ndarray:
+    # Same docs + same model => same vectors, so app restarts skip the API call.
+    if not _KB_CACHE_DIR:
+        return _embed_texts(docs)
+    docs_hash = hashlib.sha1("\n".join([_EMBED_MODEL, *docs]).encode()).hexdigest()
+    path = os.path.join(_KB_CACHE_DIR, f"kb_{docs_hash}.npz")
+    try:
+        with np.load(path) as cached:
+            return cached["embs"]
+    except Exception:
+        pass
+    embs = _embed_texts(docs)
+    try:
+        os.makedirs(_KB_CACHE_DIR, exist_ok=True)
+        np.savez(path, embs=embs)
+    except Exception:
+        pass
+    return embs
+
 def retrieve(kb: Dict, query: str, k: int = 3) -> List[str]:
-    qv = _embed_texts([query])
-    sims = _cosine_sim(qv, kb["embs"])[0]
-    idx = sims.argsort()[::-1][:k]
-    return [kb["docs"][i] for i in idx]
+    qv = _unit_rows(embed_query(query)[None, :])
+    sims = _kb_sims(kb, qv)
+    return [kb["docs"][i] for i in _top_k(sims, k)[0]]
+
+def retrieve_batch(kb: Dict, queries: List[str], k: int = 3) -> List[List[str]]:
+    """
+    Retrieve context for several questions at once (e.g. a board pack).
+    Uncached questions are embedded in a single API call; scoring is one matmul.
+    """
+    if not queries:
+        return []
+    keys = [_query_key(q) for q in queries]
+    found, missing = {}, {}
+    with _QUERY_LOCK:
+        for key, q in zip(keys, queries):
+            vec = _QUERY_CACHE.get(key)
+            if vec is not None:
+                _QUERY_CACHE.move_to_end(key)
+                found[key] = vec
+            else:
+                missing.setdefault(key, q)
+    if missing:
+        vecs = _embed_texts(list(missing.values()))
+        found.update(zip(missing.keys(), vecs))
+        with _QUERY_LOCK:
+            _remember_queries(zip(missing.keys(), vecs))
+
+    # Read from the local map: a large batch may already have evicted its own early entries
+    qv = _unit_rows(np.stack([found[key] for key in keys]))
+    sims = _kb_sims(kb, qv)
+    return [[kb["docs"][i] for i in row] for row in _top_k(sims, k)]
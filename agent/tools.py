@@ -9,19 +9,42 @@ from agent.metrics import (
     opex_breakdown_month,
     ebitda_series,
     cash_runway,
-)
-from agent.charts import (
-    revenue_vs_budget_fig,
-    gm_trend_fig,
-    opex_breakdown_fig,
-    opex_breakdown_bar_fig,
-    cash_trend_fig,
     fmt_usd,
 )
-from agent.parser import parse_months
-from agent.data import get_available_months
+from agent.parser import parse_months, parse_target_period, scan_question
+from agent.data import (
+    CAT_REV, CAT_COGS, CAT_OPEX,
+    row_category_types, session_context, source_partitions,
+)
+
+def _month_mask(rows: pd.DataFrame, target_period, target_year):
+    # Date predicate over month-indexed rows; None when the question names no period
+    if target_period:
+        if 'month_ord' in rows:
+            return rows['month_ord'].to_numpy() == target_period.ordinal
+        return rows.index == target_period
+    if target_year:
+        years = rows['year'].to_numpy() if 'year' in rows else rows.index.year
+        return years == target_year
+    return None
+
+def _category_rows(fin: pd.DataFrame, source: str, category: str) -> pd.DataFrame:
+    # One source's rows for one account category, indexed by month (sorted .loc slice, no mask)
+    part = source_partitions(fin).get(source)
+    if part is None:
+        return fin.iloc[:0].set_index('month')
+    try:
+        return part.loc[category]
+    except KeyError:
+        return part.iloc[:0].droplevel('account_category')
+
+def _records(ser: pd.Series, key: str, value: str) -> List[Dict[str, Any]]:
+    # Chart points [{key: str(label), value: float}, ...], built column-wise
+    return pd.DataFrame({key: ser.index.astype(str), value: ser.to_numpy(dtype=float)}).to_dict('records')
 
 # ---------- Tool signatures ----------
+# Each tool takes (fin, cash, question, entity); values derived once per session
+# (months, actuals, entity names, cash bounds) come from session_context(fin, cash).
 # Each tool returns:
 # {
 #   "answer": "board-ready sentence",
@@ -29,7 +52,8 @@ from agent.data import get_available_months
 # }
 
 def tool_revenue_vs_budget(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
-    months = get_available_months(fin)
+    ctx = session_context(fin, cash)
+    months = ctx.months
     sel = parse_months(question, months)
     if sel is None or sel.empty:
         sel = pd.Series([months.max()], dtype="period[M]")
@@ -44,11 +68,12 @@ def tool_revenue_vs_budget(fin: pd.DataFrame, cash: pd.DataFrame, question: str,
     }
 
 def tool_gm_trend(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
-    months = get_available_months(fin)
+    ctx = session_context(fin, cash)
+    months = ctx.months
     sel = parse_months(question, months)
     if sel is None or sel.empty:
         sel = months.sort_values().tail(3)
-    gm = gross_margin_pct_series(fin, sel, entity).dropna().sort_index()
+    gm = gross_margin_pct_series(fin, sel, entity).dropna()
     if gm.empty:
         return {"answer": "No data to compute Gross Margin % for the selected range."}
     start_m, end_m = gm.index[0], gm.index[-1]
@@ -60,94 +85,34 @@ def tool_gm_trend(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity:
         f"({('+' if delta_pp >= 0 else '')}{delta_pp:.2f} pp)."
     )
     # chart hint carries the series values
-    payload = {"points": [{"month": str(m), "gm_pct": float(v)} for m, v in gm.items()]}
+    payload = {"points": _records(gm, "month", "gm_pct")}
     return {"answer": answer, "chart": {"kind": "gm_trend", "payload": payload}}
 
 def tool_opex_breakdown(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
-    months = get_available_months(fin)
-    q = (question or "").lower()
-    
-    # Check if asking about a specific category
-    specific_category = None
-    if "marketing" in q:
-        specific_category = "Marketing"
-    elif "sales" in q:
-        specific_category = "Sales"
-    elif "r&d" in q:
-        specific_category = "R&D"
-    elif "admin" in q:
-        specific_category = "Admin"
-    
-    # Enhanced date parsing for year and month-specific filtering
-    import re
-    from dateutil.parser import parse as dtparse
-    
-    target_year = None
-    target_month = None
-    target_period = None
-    
-    # Try to parse specific month-year combinations first
-    # Pattern 1: "January 2025", "March 2024", etc.
-    month_year_pattern = r'\b(January|February|March|April|May|June|July|August|September|October|November|December|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\s+(20\d{2})\b'
-    month_year_match = re.search(month_year_pattern, question or "", re.IGNORECASE)
-    
-    if month_year_match:
-        month_str = month_year_match.group(1)
-        year_str = month_year_match.group(2)
-        try:
-            parsed_date = dtparse(f"{month_str} {year_str}")
-            target_period = pd.Period(f"{parsed_date.year}-{parsed_date.month:02d}", freq="M")
-            target_year = parsed_date.year
-            target_month = parsed_date.month
-        except:
-            pass
-    
-    # Pattern 2: "2025-01", "2024-03", etc.
-    if not target_period:
-        iso_pattern = r'\b(20\d{2})[-/](\d{1,2})\b'
-        iso_match = re.search(iso_pattern, question or "")
-        if iso_match:
-            year = int(iso_match.group(1))
-            month = int(iso_match.group(2))
-            if 1 <= month <= 12:
-                target_period = pd.Period(f"{year}-{month:02d}", freq="M")
-                target_year = year
-                target_month = month
-    
-    # Pattern 3: Year only (fallback)
-    if not target_period:
-        year_match = re.search(r'\b(20\d{2})\b', question or "")
-        if year_match:
-            target_year = int(year_match.group(1))
-    
-    # Filter to actuals only for spend questions
-    actuals_fin = fin[fin['source'] == 'actuals'].copy()
+    ctx = session_context(fin, cash)
+    months = ctx.months
+    # Specific category and year/month filter, from one scan of the question
+    specific_category, (target_period, target_year, target_month) = scan_question(question)
     
     if specific_category:
-        # Calculate total spend for specific category
+        # Actuals only for spend questions: one slice of the (category, month)-indexed partition
         category_pattern = f"Opex:{specific_category}"
-        category_data = actuals_fin[actuals_fin['account_category'] == category_pattern]
-        
+        category_data = _category_rows(fin, 'actuals', category_pattern)
         if category_data.empty:
             return {"answer": f"No {specific_category} expenses found in the dataset."}
         
         # Apply date filters if specified
-        if target_period:
-            # Specific month filtering
-            category_data = category_data[category_data['month'] == target_period]
-            if category_data.empty:
-                return {"answer": f"No {specific_category} expenses found for {target_period}."}
-        elif target_year:
-            # Year filtering
-            category_data = category_data[category_data['month'].dt.year == target_year]
+        month_mask = _month_mask(category_data, target_period, target_year)
+        if month_mask is not None:
+            category_data = category_data[month_mask]
             if category_data.empty:
-                return {"answer": f"No {specific_category} expenses found for {target_year}."}
+                return {"answer": f"No {specific_category} expenses found for {target_period or target_year}."}
         
         total_spend = float(category_data['amount_usd'].sum())
-        months_with_data = category_data['month'].nunique()
+        months_with_data = category_data.index.nunique()
         
         # Get monthly breakdown for chart
-        monthly_spend = category_data.groupby('month')['amount_usd'].sum().sort_index()
+        monthly_spend = category_data.groupby(level='month', sort=False)['amount_usd'].sum()
         
         # Build answer based on the specificity of the date filter
         if target_period:
@@ -155,15 +120,15 @@ def tool_opex_breakdown(fin: pd.DataFrame, cash: pd.DataFrame, question: str, en
             answer = f"Based on the actuals, {specific_category} spend in {target_period} was {fmt_usd(total_spend)}."
         elif target_year:
             # Specific year
-            date_range = f"{category_data['month'].min()} → {category_data['month'].max()}"
+            date_range = f"{category_data.index.min()} → {category_data.index.max()}"
             answer = f"Based on the actuals, {specific_category} spend in {target_year} totals {fmt_usd(total_spend)} across {months_with_data} months ({date_range})."
         else:
             # All time
-            date_range = f"{category_data['month'].min()} → {category_data['month'].max()}"
+            date_range = f"{category_data.index.min()} → {category_data.index.max()}"
             answer = f"Based on the actuals, {specific_category} spend totals {fmt_usd(total_spend)} across {months_with_data} months ({date_range})."
         
         # Create trend chart for the specific category
-        data_points = [{"month": str(m), "amount": float(v)} for m, v in monthly_spend.items()]
+        data_points = _records(monthly_spend, "month", "amount")
         return {"answer": answer, "chart": {"kind": "category_trend", "payload": {"category": specific_category, "data": data_points}}}
     
     else:
@@ -172,16 +137,17 @@ def tool_opex_breakdown(fin: pd.DataFrame, cash: pd.DataFrame, question: str, en
         if sel is None or sel.empty:
             sel = pd.Series([months.max()], dtype="period[M]")
         m = sel.iloc[-1]
-        ser = opex_breakdown_month(actuals_fin, m, entity)
+        ser = opex_breakdown_month(fin, m, entity)
         if ser.empty:
             return {"answer": f"No Opex categories found for {m}."}
         total = float(ser.sum())
         answer = f"Opex breakdown for {m}; total {fmt_usd(total)}."
-        payload = {"month": str(m), "bars": [{"category": str(k), "amount": float(v)} for k, v in ser.items()]}
+        payload = {"month": str(m), "bars": _records(ser, "category", "amount")}
         return {"answer": answer, "chart": {"kind": "opex_breakdown", "payload": payload}}
 
 def tool_cash_runway(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
-    months = get_available_months(fin)
+    ctx = session_context(fin, cash)
+    months = ctx.months
     last6 = months.sort_values().tail(6)
     e = ebitda_series(fin, last6, entity)
     r = cash_runway(cash, e.tail(3))
@@ -198,78 +164,34 @@ def tool_cash_runway(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entit
 
 def tool_revenue_analysis(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
     """Comprehensive revenue analysis for CFO-level questions"""
-    months = get_available_months(fin)
+    ctx = session_context(fin, cash)
+    months = ctx.months
     q = (question or "").lower()
     
     # Enhanced date parsing for year and month-specific filtering
-    import re
-    from dateutil.parser import parse as dtparse
-    
-    target_year = None
-    target_month = None
-    target_period = None
-    
-    # Try to parse specific month-year combinations first
-    # Pattern 1: "January 2025", "March 2024", etc.
-    month_year_pattern = r'\b(January|February|March|April|May|June|July|August|September|October|November|December|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\s+(20\d{2})\b'
-    month_year_match = re.search(month_year_pattern, question or "", re.IGNORECASE)
-    
-    if month_year_match:
-        month_str = month_year_match.group(1)
-        year_str = month_year_match.group(2)
-        try:
-            parsed_date = dtparse(f"{month_str} {year_str}")
-            target_period = pd.Period(f"{parsed_date.year}-{parsed_date.month:02d}", freq="M")
-            target_year = parsed_date.year
-            target_month = parsed_date.month
-        except:
-            pass
-    
-    # Pattern 2: "2025-01", "2024-03", etc.
-    if not target_period:
-        iso_pattern = r'\b(20\d{2})[-/](\d{1,2})\b'
-        iso_match = re.search(iso_pattern, question or "")
-        if iso_match:
-            year = int(iso_match.group(1))
-            month = int(iso_match.group(2))
-            if 1 <= month <= 12:
-                target_period = pd.Period(f"{year}-{month:02d}", freq="M")
-                target_year = year
-                target_month = month
+    target_period, target_year, target_month = parse_target_period(question)
     
-    # Pattern 3: Year only (fallback)
-    if not target_period:
-        year_match = re.search(r'\b(20\d{2})\b', question or "")
-        if year_match:
-            target_year = int(year_match.group(1))
-    
-    # Filter revenue data
-    revenue_data = fin[fin['account_category'] == 'Revenue'].copy()
-    
-    if revenue_data.empty:
+    # Revenue rows per source: slices of the (category, month)-indexed partitions
+    rev_actuals = _category_rows(fin, 'actuals', 'Revenue')
+    rev_budget = _category_rows(fin, 'budget', 'Revenue')
+    if rev_actuals.empty and rev_budget.empty:
         return {"answer": "No revenue data found in the dataset."}
     
     # Apply date filters if specified
-    if target_period:
-        # Specific month filtering
-        revenue_data = revenue_data[revenue_data['month'] == target_period]
-        if revenue_data.empty:
-            return {"answer": f"No revenue data found for {target_period}."}
-        months = months[months == target_period]
-    elif target_year:
-        # Year filtering
-        revenue_data = revenue_data[revenue_data['month'].dt.year == target_year]
-        if revenue_data.empty:
-            return {"answer": f"No revenue data found for {target_year}."}
-        months = months[months.dt.year == target_year]
+    if target_period or target_year:
+        rev_actuals = rev_actuals[_month_mask(rev_actuals, target_period, target_year)]
+        rev_budget = rev_budget[_month_mask(rev_budget, target_period, target_year)]
+        if rev_actuals.empty and rev_budget.empty:
+            return {"answer": f"No revenue data found for {target_period or target_year}."}
+        months = months[(months == target_period) if target_period else (months.dt.year == target_year)]
     
-    # Calculate totals by source
-    actuals_total = float(revenue_data[revenue_data['source'] == 'actuals']['amount_usd'].sum())
-    budget_total = float(revenue_data[revenue_data['source'] == 'budget']['amount_usd'].sum())
+    # Monthly revenue trends: one aggregation per source; the totals fold from these
+    monthly_actuals = rev_actuals.groupby(level='month', sort=False)['amount_usd'].sum()
+    monthly_budget = rev_budget.groupby(level='month', sort=False)['amount_usd'].sum()
     
-    # Monthly revenue trends
-    monthly_actuals = revenue_data[revenue_data['source'] == 'actuals'].groupby('month')['amount_usd'].sum().sort_index()
-    monthly_budget = revenue_data[revenue_data['source'] == 'budget'].groupby('month')['amount_usd'].sum().sort_index()
+    # Calculate totals by source
+    actuals_total = float(monthly_actuals.sum())
+    budget_total = float(monthly_budget.sum())
     
     # Performance metrics
     variance = actuals_total - budget_total
@@ -292,8 +214,8 @@ def tool_revenue_analysis(fin: pd.DataFrame, cash: pd.DataFrame, question: str,
     
     # Entity breakdown
     entity_breakdown = ""
-    if revenue_data['entity'].nunique() > 1:
-        entity_actuals = revenue_data[revenue_data['source'] == 'actuals'].groupby('entity')['amount_usd'].sum().sort_values(ascending=False)
+    if pd.concat([rev_actuals['entity'], rev_budget['entity']]).nunique() > 1:
+        entity_actuals = rev_actuals.groupby('entity', observed=True)['amount_usd'].sum().sort_values(ascending=False)
         entity_breakdown = f"\n• By Entity: " + ", ".join([f"{entity} {fmt_usd(amount)}" for entity, amount in entity_actuals.items()])
     
     # Build title based on the specificity of the date filter
@@ -313,58 +235,52 @@ def tool_revenue_analysis(fin: pd.DataFrame, cash: pd.DataFrame, question: str,
              f"{entity_breakdown}")
     
     # Create revenue trend chart
-    chart_data = []
-    for month in monthly_actuals.index:
-        point = {"month": str(month), "actual": float(monthly_actuals.get(month, 0))}
-        if month in monthly_budget.index:
-            point["budget"] = float(monthly_budget[month])
-        chart_data.append(point)
+    # Budget aligned onto the actual months with one index join; months without budget omit the key
+    chart_df = monthly_actuals.rename('actual').to_frame().join(monthly_budget.rename('budget'), how='left')
+    chart_df.index = chart_df.index.astype(str)
+    chart_data = chart_df.rename_axis('month').reset_index().to_dict('records')
+    if chart_df['budget'].isna().any():
+        chart_data = [{k: v for k, v in p.items() if k != 'budget' or pd.notna(v)} for p in chart_data]
     
     return {"answer": answer, "chart": {"kind": "revenue_trend", "payload": {"data": chart_data}}}
 
 def tool_financial_performance(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
     """Comprehensive financial performance analysis for CFO dashboard"""
-    months = get_available_months(fin)
+    ctx = session_context(fin, cash)
+    months = ctx.months
     
     if months.empty:
         return {"answer": "No financial data available for analysis."}
     
-    # Get actuals data
-    actuals = fin[fin['source'] == 'actuals'].copy()
+    # Get actuals data (selected once per frame)
+    actuals = ctx.actuals
     
-    # Revenue analysis
-    revenue = actuals[actuals['account_category'] == 'Revenue']['amount_usd'].sum()
+    # Revenue, COGS and OpEx totals in one groupby over the category type set at load
+    sums = actuals['amount_usd'].groupby(row_category_types(actuals)).sum()
+    revenue = sums.get(CAT_REV, 0.0)
     
     # Cost analysis
-    cogs = actuals[actuals['account_category'] == 'COGS']['amount_usd'].sum()
+    cogs = sums.get(CAT_COGS, 0.0)
     gross_profit = revenue - cogs
     gross_margin_pct = (gross_profit / revenue * 100) if revenue > 0 else 0
     
     # OpEx analysis
-    opex_categories = actuals[actuals['account_category'].str.startswith('Opex:')]
-    total_opex = opex_categories['amount_usd'].sum()
+    total_opex = sums.get(CAT_OPEX, 0.0)
     
     # EBITDA calculation
     ebitda = gross_profit - total_opex
     ebitda_margin_pct = (ebitda / revenue * 100) if revenue > 0 else 0
     
     # Cash analysis
-    cash_start = cash['amount_usd'].iloc[0] if not cash.empty else 0
-    cash_end = cash['amount_usd'].iloc[-1] if not cash.empty else 0
+    cash_start, cash_end = ctx.cash_start, ctx.cash_end
     cash_burn = cash_start - cash_end
     
     # Monthly burn rate (last 6 months)
     if len(months) >= 6:
         recent_months = months.tail(6)
-        recent_ebitda = []
-        for m in recent_months:
-            month_data = actuals[actuals['month'] == m]
-            month_rev = month_data[month_data['account_category'] == 'Revenue']['amount_usd'].sum()
-            month_cogs = month_data[month_data['account_category'] == 'COGS']['amount_usd'].sum()
-            month_opex = month_data[month_data['account_category'].str.startswith('Opex:')]['amount_usd'].sum()
-            month_ebitda = month_rev - month_cogs - month_opex
-            recent_ebitda.append(month_ebitda)
-        avg_monthly_burn = -sum(recent_ebitda) / len(recent_ebitda) if recent_ebitda else 0
+        # One pass over the pivot; months without actuals count as zero EBITDA
+        recent_ebitda = ebitda_series(fin, recent_months).reindex(recent_months, fill_value=0.0)
+        avg_monthly_burn = -float(recent_ebitda.mean())
         runway_months = cash_end / avg_monthly_burn if avg_monthly_burn > 0 else float('inf')
     else:
         avg_monthly_burn = 0
@@ -383,7 +299,8 @@ def tool_financial_performance(fin: pd.DataFrame, cash: pd.DataFrame, question:
     return {"answer": answer, "chart": {"kind": "cash_trend", "payload": {}}}
 
 def tool_data_coverage(fin: pd.DataFrame, cash: pd.DataFrame, question: str, entity: Optional[str]) -> Dict[str, Any]:
-    months = get_available_months(fin)
+    ctx = session_context(fin, cash)
+    months = ctx.months
     n = len(months)
     if n == 0:
         return {"answer": "I don’t see any monthly rows in the dataset."}
@@ -393,17 +310,18 @@ def tool_data_coverage(fin: pd.DataFrame, cash: pd.DataFrame, question: str, ent
     historical = months[months <= current_period]
     projected = months[months > current_period]
     
-    entities = fin['entity'].nunique()
-    entity_names = sorted(fin['entity'].dropna().unique().tolist())
+    entity_names = ctx.entity_names
+    entities = len(entity_names)
     
     # Calculate key financial metrics across the dataset
-    revenue_data = fin[fin['account_category'] == 'Revenue'].groupby(['month', 'source'])['amount_usd'].sum().unstack(fill_value=0)
-    total_revenue_actual = revenue_data.get('actuals', pd.Series()).sum() if 'actuals' in revenue_data.columns else 0
-    total_revenue_budget = revenue_data.get('budget', pd.Series()).sum() if 'budget' in revenue_data.columns else 0
+    revenue_totals = fin.loc[fin['account_category'] == 'Revenue', 'amount_usd'].groupby(
+        fin['source'], observed=True
+    ).sum()
+    total_revenue_actual = revenue_totals.get('actuals', 0.0)
+    total_revenue_budget = revenue_totals.get('budget', 0.0)
     
     # Cash analysis
-    cash_start = cash['amount_usd'].iloc[0] if not cash.empty else 0
-    cash_end = cash['amount_usd'].iloc[-1] if not cash.empty else 0
+    cash_start, cash_end = ctx.cash_start, ctx.cash_end
     cash_change = cash_end - cash_start
     
     # Build comprehensive answer with numerical insights
@@ -515,22 +433,21 @@ TOOL_SPECS = [
 ]
 
 
-# Dispatcher used by the agent after tool call
+# Dispatcher used by the agent after tool call: tool name (as in TOOL_SPECS) -> implementation
+_DISPATCH = {
+    "revenue_analysis": tool_revenue_analysis,
+    "revenue_vs_budget": tool_revenue_vs_budget,
+    "gm_trend": tool_gm_trend,
+    "opex_breakdown": tool_opex_breakdown,
+    "cash_runway": tool_cash_runway,
+    "financial_performance": tool_financial_performance,
+    "data_coverage": tool_data_coverage,
+}
+
 def dispatch(tool_name: str, args: Dict[str, Any], fin: pd.DataFrame, cash: pd.DataFrame, question_text: str, entity: Optional[str]) -> Dict[str, Any]:
     hint = (args or {}).get("month_hint") or question_text
     ent = (args or {}).get("entity") or entity
-    if tool_name == "revenue_analysis":
-        return tool_revenue_analysis(fin, cash, hint, ent)
-    if tool_name == "revenue_vs_budget":
-        return tool_revenue_vs_budget(fin, cash, hint, ent)
-    if tool_name == "gm_trend":
-        return tool_gm_trend(fin, cash, hint, ent)
-    if tool_name == "opex_breakdown":
-        return tool_opex_breakdown(fin, cash, hint, ent)
-    if tool_name == "cash_runway":
-        return tool_cash_runway(fin, cash, hint, ent)
-    if tool_name == "financial_performance":
-        return tool_financial_performance(fin, cash, hint, ent)
-    if tool_name == "data_coverage":
-        return tool_data_coverage(fin, cash, hint, ent)
+    fn = _DISPATCH.get(tool_name)
+    if fn is not None:
+        return fn(fin, cash, hint, ent)
     return {"answer": "Unknown tool requested."}
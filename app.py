@@ -1,21 +1,9 @@
 import io
-import os
+from functools import lru_cache
 import streamlit as st
 import pandas as pd
 
-from agent.data import load_from_xlsx, load_from_csv_dir, normalize, get_available_months
-from agent.pdf import export_board_pack
-from agent.charts import (
-    revenue_vs_budget_fig,
-    gm_trend_fig,
-    opex_breakdown_fig,
-    opex_breakdown_bar_fig,
-    cash_trend_fig,
-    dataset_overview_fig,
-    category_trend_fig,
-    revenue_trend_fig,
-    fmt_usd,  # kept in case you use it later
-)
+from agent.data import load_from_xlsx, load_from_csv_dir, normalize, get_available_months, entity_names
 from agent.metrics import (
     revenue_month,
     opex_breakdown_month,
@@ -23,6 +11,20 @@ from agent.metrics import (
 from agent.rag import build_kb
 from agent.agent import run_agent
 
+# Serialize figures with orjson when it's installed (much faster on long traces)
+try:
+    import orjson  # noqa: F401
+    import plotly.io as pio
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+# Plotly figure builders (and their template setup) load on the first chart, not at startup
+@lru_cache(maxsize=None)
+def _charts():
+    import agent.charts
+    return agent.charts
+
 
 # ---------------- Page ----------------
 st.set_page_config(page_title="FP&A CFO Copilot — Agentic RAG", layout="wide")
@@ -34,16 +36,62 @@ st.caption(
 
 
 # ---------------- Data loaders ----------------
-@st.cache_data(show_spinner=False)
+# cache_resource hands every rerun the same objects (cache_data would deep-copy the frames on
+# each access). Do not mutate the returned frames: changes would leak into every session.
+@st.cache_resource(show_spinner=False)
 def _load_default():
     dfs = load_from_csv_dir("fixtures")
-    return normalize(dfs)
+    return {**normalize(dfs), "version": "default"}
 
-@st.cache_data(show_spinner=False)
-def _load_xlsx(file_bytes: bytes):
-    with io.BytesIO(file_bytes) as f:
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _load_xlsx(file_id: str, _file_bytes: bytes):
+    # Cached on the uploader's file_id; the (unhashed) bytes are only read on a miss
+    with io.BytesIO(_file_bytes) as f:
         dfs = load_from_xlsx(f)
-    return normalize(dfs)
+    return {**normalize(dfs), "version": f"xlsx:{file_id}"}
+
+
+# ---------------- Cached metrics ----------------
+# Keyed on the loader's data version string; the (underscore) frames are not hashed at all.
+# Each version names one immutable load, so the version alone identifies the data.
+# Figures are built from these on each render (cache_data would pickle them on every hit,
+# which costs about as much as rebuilding these small figures).
+@st.cache_data(ttl="1h", max_entries=128, show_spinner=False)
+def _available_months(data_version: str, _fin_df: pd.DataFrame):
+    return get_available_months(_fin_df)
+
+@st.cache_data(ttl="1h", max_entries=128, show_spinner=False)
+def _revenue_month(data_version: str, _fin_df: pd.DataFrame, m, entity=None):
+    return revenue_month(_fin_df, m, entity)
+
+@st.cache_data(ttl="1h", max_entries=128, show_spinner=False)
+def _opex_breakdown_month(data_version: str, _fin_df: pd.DataFrame, m, entity=None):
+    return opex_breakdown_month(_fin_df, m, entity)
+
+@st.cache_data(ttl="15m", show_spinner=False)
+def _build_board_pack_bytes(data_version: str, _fin_df: pd.DataFrame, _cash_df: pd.DataFrame, m) -> bytes:
+    # Latest-month Rev vs Budget and Opex, plus Cash trend; the PDF is written to memory, not disk
+    from agent.pdf import export_board_pack  # reportlab/kaleido only when exporting
+
+    actual, budget, *_ = _revenue_month(data_version, _fin_df, m, entity=None)
+    fig_rev = _charts().revenue_vs_budget_fig(actual, budget, m, for_print=True)
+
+    ser_opex = _opex_breakdown_month(data_version, _fin_df, m, entity=None)
+    fig_opex = _charts().opex_breakdown_bar_fig(ser_opex, m, for_print=True)
+
+    fig_cash = _charts().cash_trend_fig(_cash_df, for_print=True)
+
+    buf = io.BytesIO()
+    export_board_pack(
+        buf,
+        title="CFO Board Pack",
+        blocks=[
+            (f"Revenue vs Budget — {m}", fig_rev),
+            (f"Opex Breakdown — {m}", fig_opex),
+            ("Cash Balance Trend", fig_cash),
+        ],
+    )
+    return buf.getvalue()
 
 
 # ---------------- Sidebar ----------------
@@ -51,63 +99,51 @@ with st.sidebar:
     st.header("Data Source")
     uploaded = st.file_uploader("Upload XLSX (optional)", type=["xlsx"])
     if uploaded:
-        norm = _load_xlsx(uploaded.read())
+        # Read the upload once per file, not on every rerun
+        if st.session_state.get("xlsx_id") != uploaded.file_id:
+            st.session_state["xlsx_bytes"] = uploaded.getvalue()
+            st.session_state["xlsx_id"] = uploaded.file_id
+        norm = _load_xlsx(st.session_state["xlsx_id"], st.session_state["xlsx_bytes"])
     else:
         norm = _load_default()
 
     fin = norm["financials"]
     cash = norm["cash"]
+    data_version = norm["version"]
 
-    months_all = get_available_months(fin)
+    months_all = _available_months(data_version, fin)
     st.divider()
     st.write("**Data coverage**")
-    if not months_all.empty:
-        st.write(f"{str(months_all.min())} → {str(months_all.max())} ({len(months_all)} months)")
-        entities = fin['entity'].dropna().unique().tolist()
-        st.write(f"Entities: {', '.join(sorted(entities)) if entities else '—'}")
+    # Sorted distinct months: the bounds are the first and last entries, no min()/max() scans
+    first_month = months_all.iat[0] if not months_all.empty else None
+    latest_month = months_all.iat[-1] if not months_all.empty else None
+    if latest_month is not None:
+        st.write(f"{first_month} → {latest_month} ({len(months_all)} months)")
+        entities = entity_names(fin)
+        st.write(f"Entities: {', '.join(entities) if entities else '—'}")
     else:
         st.write("—")
 
     st.divider()
     st.caption("PDF export uses latest-month for Rev vs Budget and Opex, plus Cash trend.")
     if st.button("Export Board Pack (3 pages)"):
-        if months_all.empty:
+        if latest_month is None:
             st.warning("No data available to export.")
         else:
-            m = months_all.max()
-            actual, budget, *_ = revenue_month(fin, m, entity=None)
-            fig_rev = revenue_vs_budget_fig(actual, budget, m, for_print=True)
-
-            ser_opex = opex_breakdown_month(fin, m, entity=None)
-            fig_opex = opex_breakdown_bar_fig(ser_opex, m, for_print=True)
-
-            fig_cash = cash_trend_fig(cash, for_print=True)
-
-            pdf_path = os.path.join(os.getcwd(), "board_pack.pdf")
-            export_board_pack(
-                pdf_path,
-                title="CFO Board Pack",
-                blocks=[
-                    (f"Revenue vs Budget — {m}", fig_rev),
-                    (f"Opex Breakdown — {m}", fig_opex),
-                    ("Cash Balance Trend", fig_cash),
-                ],
+            st.download_button(
+                "Download board_pack.pdf",
+                _build_board_pack_bytes(data_version, fin, cash, latest_month),
+                file_name="board_pack.pdf",
+                mime="application/pdf",
             )
-            with open(pdf_path, "rb") as f:
-                st.download_button(
-                    "Download board_pack.pdf",
-                    f,
-                    file_name="board_pack.pdf",
-                    mime="application/pdf",
-                )
 
 
 # ---------------- Build tiny KB for RAG ----------------
-@st.cache_resource(show_spinner=False)
-def _kb(fin_df: pd.DataFrame, cash_df: pd.DataFrame):
-    return build_kb(fin_df, cash_df)
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _kb(data_version: str, _fin_df: pd.DataFrame, _cash_df: pd.DataFrame):
+    return build_kb(_fin_df, _cash_df)
 
-kb = _kb(fin, cash)
+kb = _kb(data_version, fin, cash)
 
 
 # ---------------- Main input ----------------
@@ -117,69 +153,77 @@ run = st.button("Run", type="primary")
 
 
 # ---------------- Chart renderer (robust) ----------------
-def render_chart(chart_hint: dict):
-    kind = (chart_hint or {}).get("kind")
-    payload = (chart_hint or {}).get("payload", {}) or {}
-
-    if not kind:
-        return  # nothing to render
-
-    if kind == "rev_vs_budget":
-        m = payload.get("month")
-        actual = payload.get("actual")
-        budget = payload.get("budget")
-        if m is None or actual is None or budget is None:
-            st.warning("Missing data for Revenue vs Budget chart.")
+# One small renderer per chart kind; render_chart looks the kind up once
+def _render_rev_vs_budget(payload: dict):
+    m = payload.get("month")
+    actual = payload.get("actual")
+    budget = payload.get("budget")
+    if m is None or actual is None or budget is None:
+        st.warning("Missing data for Revenue vs Budget chart.")
+        return
+    fig = _charts().revenue_vs_budget_fig(actual, budget, pd.Period(m, freq="M"))
+    st.plotly_chart(fig, use_container_width=True)
+
+def _render_gm_trend(payload: dict):
+    pts = payload.get("points", [])
+    if not pts:
+        st.warning("No GM% points to plot.")
+        return
+    try:
+        df = pd.DataFrame(pts)
+        if not {"month", "gm_pct"} <= set(df.columns) or df[["month", "gm_pct"]].isna().any(axis=None):
+            st.warning("Incomplete GM% data.")
             return
-        fig = revenue_vs_budget_fig(actual, budget, pd.Period(m, freq="M"))
-        st.plotly_chart(fig, use_container_width=True)
+        s = pd.Series(df["gm_pct"].to_numpy(), index=pd.PeriodIndex(df["month"], freq="M"))
+        st.plotly_chart(_charts().gm_trend_fig(s), use_container_width=True)
+    except Exception as e:
+        st.warning(f"Could not render GM% chart: {e}")
+
+def _render_opex_breakdown(payload: dict):
+    bars = payload.get("bars", [])
+    month_label = payload.get("month", "Selected month")
+    if not bars:
+        st.warning("No Opex bars to plot.")
+        return
+    df = pd.DataFrame(bars)
+    if not {"category", "amount"} <= set(df.columns) or df[["category", "amount"]].isna().any(axis=None):
+        st.warning("Incomplete Opex data.")
+        return
+    ser = pd.Series(df["amount"].to_numpy(), index=df["category"])
+    st.plotly_chart(_charts().opex_breakdown_fig(ser, month_label), use_container_width=True)
+
+def _render_cash_trend(payload: dict):
+    st.plotly_chart(_charts().cash_trend_fig(cash), use_container_width=True)
+
+def _render_dataset_overview(payload: dict):
+    st.plotly_chart(_charts().dataset_overview_fig(fin, cash), use_container_width=True)
+
+def _render_category_trend(payload: dict):
+    category = payload.get("category", "Category")
+    data_points = payload.get("data", [])
+    if data_points:
+        st.plotly_chart(_charts().category_trend_fig(category, data_points), use_container_width=True)
+
+def _render_revenue_trend(payload: dict):
+    data_points = payload.get("data", [])
+    if data_points:
+        st.plotly_chart(_charts().revenue_trend_fig(data_points), use_container_width=True)
+
+_RENDERERS = {
+    "rev_vs_budget": _render_rev_vs_budget,
+    "gm_trend": _render_gm_trend,
+    "opex_breakdown": _render_opex_breakdown,
+    "cash_trend": _render_cash_trend,
+    "dataset_overview": _render_dataset_overview,
+    "category_trend": _render_category_trend,
+    "revenue_trend": _render_revenue_trend,
+}
 
-    elif kind == "gm_trend":
-        pts = payload.get("points", [])
-        if not pts:
-            st.warning("No GM% points to plot.")
-            return
-        try:
-            idx = [pd.Period(p["month"], freq="M") for p in pts if "month" in p]
-            vals = [p["gm_pct"] for p in pts if "gm_pct" in p]
-            if not idx or not vals or len(idx) != len(vals):
-                st.warning("Incomplete GM% data.")
-                return
-            s = pd.Series(vals, index=idx)
-            st.plotly_chart(gm_trend_fig(s), use_container_width=True)
-        except Exception as e:
-            st.warning(f"Could not render GM% chart: {e}")
-
-    elif kind == "opex_breakdown":
-        bars = payload.get("bars", [])
-        month_label = payload.get("month", "Selected month")
-        if not bars:
-            st.warning("No Opex bars to plot.")
-            return
-        cats = [b.get("category") for b in bars if "category" in b]
-        vals = [b.get("amount") for b in bars if "amount" in b]
-        if not cats or not vals or len(cats) != len(vals):
-            st.warning("Incomplete Opex data.")
-            return
-        ser = pd.Series(vals, index=cats)
-        st.plotly_chart(opex_breakdown_fig(ser, month_label), use_container_width=True)
-
-    elif kind == "cash_trend":
-        st.plotly_chart(cash_trend_fig(cash), use_container_width=True)
-    
-    elif kind == "dataset_overview":
-        st.plotly_chart(dataset_overview_fig(fin, cash), use_container_width=True)
-    
-    elif kind == "category_trend":
-        category = payload.get("category", "Category")
-        data_points = payload.get("data", [])
-        if data_points:
-            st.plotly_chart(category_trend_fig(category, data_points), use_container_width=True)
-    
-    elif kind == "revenue_trend":
-        data_points = payload.get("data", [])
-        if data_points:
-            st.plotly_chart(revenue_trend_fig(data_points), use_container_width=True)
+def render_chart(chart_hint: dict):
+    renderer = _RENDERERS.get((chart_hint or {}).get("kind"))
+    if renderer is None:
+        return  # text-only answer or unknown kind: nothing to render (and no Plotly import)
+    renderer((chart_hint or {}).get("payload", {}) or {})
 
 
 # ---------------- Run agent ----------------
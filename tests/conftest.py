@@ -5,10 +5,14 @@ Pytest configuration and shared fixtures for CFO Agentic RAG tests
 import pytest
 import sys
 import os
+from collections import OrderedDict
+
+import numpy as np
 
 # Add the parent directory to the path so we can import from agent
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from agent import rag
 from agent.data import load_from_csv_dir, normalize
 
 
@@ -31,4 +35,24 @@ def financial_data(sample_data):
 def cash_data(sample_data):
     """Get just the cash data"""
     _, cash = sample_data
-    return cash
\ No newline at end of file
+    return cash
+
+
+@pytest.fixture
+def fake_embed(monkeypatch, tmp_path):
+    """Deterministic stand-in for the OpenAI embedding call; records each batch"""
+    calls = []
+
+    def _fake(texts):
+        calls.append(list(texts))
+        vecs = np.zeros((len(texts), 8), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for ch in t.lower():
+                vecs[i, ord(ch) % 8] += 1.0
+        return vecs
+
+    monkeypatch.setattr(rag, "_embed_texts", _fake)
+    monkeypatch.setattr(rag, "_QUERY_CACHE", OrderedDict())
+    monkeypatch.setattr(rag, "_QUERY_CACHE_DIRTY", False)
+    monkeypatch.setattr(rag, "_KB_CACHE_DIR", str(tmp_path))
+    return calls
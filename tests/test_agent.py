@@ -0,0 +1,163 @@
+"""
+Tests for agent routing, streaming tool dispatch and the answer cache (no network calls)
+"""
+
+import threading
+import types
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from agent import agent, rag
+
+
+def _event(kind, item=None):
+    return types.SimpleNamespace(type=kind, item=item)
+
+
+def _function_call(name, arguments='{}'):
+    return types.SimpleNamespace(type='function_call', name=name, arguments=arguments)
+
+
+class _FakeStream:
+    """Stands in for client.responses.stream(); records how far it was read"""
+
+    def __init__(self, events, log):
+        self.events, self.log = events, log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.log.append('closed')
+
+    def __iter__(self):
+        for event in self.events:
+            self.log.append(event.type)
+            yield event
+
+    def get_final_response(self):
+        return {}
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, fake_embed):
+    """Deterministic embeddings plus a scripted tool-calling stream"""
+    monkeypatch.setattr(agent, "_RESULT_CACHE", OrderedDict())
+
+    llm = types.SimpleNamespace(events=[], log=[], calls=0)
+
+    def _stream(**kwargs):
+        llm.calls += 1
+        return _FakeStream(llm.events, llm.log)
+
+    client = types.SimpleNamespace(responses=types.SimpleNamespace(stream=_stream))
+    monkeypatch.setattr(agent, "_client", lambda: client)
+    return llm
+
+
+class TestHeuristicRouting:
+    """Test the keyword fallback used when the model picks no tool"""
+
+    @pytest.mark.parametrize('question, tool', [
+        ('How much revenue did we get overall?', 'revenue_analysis'),
+        ('What was June 2025 revenue vs budget?', 'revenue_vs_budget'),
+        ('Show gross margin trend', 'gm_trend'),
+        ('How much was spent on marketing in January 2025?', 'opex_breakdown'),
+        ('Give me a financial performance summary', 'financial_performance'),
+        ('What is our cash burn?', 'cash_runway'),
+        ('How many months of data are here?', 'data_coverage'),
+        ('Hello there', 'data_coverage'),
+    ])
+    def test_heuristic_tool(self, question, tool):
+        assert agent._heuristic_tool(question) == tool
+
+
+class TestRunAgent:
+    """Test streaming dispatch and answer caching"""
+
+    def test_dispatches_on_first_tool_call(self, sample_data, fake_llm):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+        fake_llm.events = [
+            _event('response.created'),
+            _event('response.output_item.done', _function_call('cash_runway')),
+            _event('response.completed'),
+        ]
+
+        out = agent.run_agent('What is our cash runway?', fin, cash, kb)
+
+        assert out['tool'] == 'cash_runway'
+        assert 'Runway is' in out['result']['answer']
+        # the stream is closed right after the tool call, before it completes
+        assert fake_llm.log == ['response.created', 'response.output_item.done', 'closed']
+
+    def test_falls_back_without_tool_call(self, sample_data, fake_llm):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+        fake_llm.events = [_event('response.completed')]
+
+        out = agent.run_agent('What is our cash runway?', fin, cash, kb)
+
+        assert out['tool'] == 'cash_runway'
+
+    def test_repeated_question_is_cached(self, sample_data, fake_llm):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+
+        first = agent.run_agent('What is our cash runway?', fin, cash, kb)
+        second = agent.run_agent('what is our cash runway', fin, cash, kb)
+
+        assert second == first
+        assert fake_llm.calls == 1
+
+    def test_cached_answer_is_a_copy(self, sample_data, fake_llm):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+
+        first = agent.run_agent('What is our cash runway?', fin, cash, kb)
+        first['result']['answer'] = 'mutated'
+        second = agent.run_agent('What is our cash runway?', fin, cash, kb)
+        second['result']['chart']['kind'] = 'mutated'
+        third = agent.run_agent('What is our cash runway?', fin, cash, kb)
+
+        assert 'Runway is' in third['result']['answer']
+        assert third['result']['chart']['kind'] == 'cash_trend'
+        assert fake_llm.calls == 1
+
+    def test_different_month_is_not_served_from_cache(self, sample_data, fake_llm):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+
+        jan = agent.run_agent('Marketing spend in January 2025', fin, cash, kb)
+        feb = agent.run_agent('Marketing spend in February 2025', fin, cash, kb)
+
+        assert fake_llm.calls == 2
+        assert '2025-01' in jan['result']['answer']
+        assert '2025-02' in feb['result']['answer']
+
+    def test_cache_is_thread_safe(self, sample_data, fake_llm, monkeypatch):
+        fin, cash = sample_data
+        monkeypatch.setattr(agent, "_RESULT_CACHE_SIZE", 8)
+        qv = np.ones(8, dtype=np.float32) / np.sqrt(8)
+        sig = frozenset({'runway'})
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(200):
+                    key = f"{n}-{i}"
+                    agent._store_result(key, qv, sig, fin, cash, {"tool": "cash_runway", "result": {}})
+                    agent._cached_result(f"{n}-{i - 1}", qv, sig, fin, cash)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert len(agent._RESULT_CACHE) <= 8
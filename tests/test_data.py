@@ -4,7 +4,11 @@ Tests for data loading and processing functions
 
 import pytest
 import pandas as pd
-from agent.data import load_from_csv_dir, normalize, get_available_months
+from agent.data import (
+    load_from_csv_dir, normalize, get_available_months, category_columns, actuals_rows,
+    source_partitions, row_category_types, cash_bounds, session_context, month_totals,
+    CAT_REV, CAT_COGS, CAT_OPEX, CAT_OTHER,
+)
 
 
 class TestDataLoading:
@@ -49,6 +53,74 @@ class TestDataLoading:
         assert pd.api.types.is_numeric_dtype(fin['amount_usd'])
         assert pd.api.types.is_numeric_dtype(cash['amount_usd'])
     
+    def test_category_types(self, financial_data):
+        """Test that account categories are classified once at normalize time"""
+        assert financial_data['account_category'].dtype == 'category'
+        assert financial_data['source'].dtype == 'category'
+        assert financial_data['month'].is_monotonic_increasing
+
+    def test_entity_columns_categorical(self, financial_data, cash_data):
+        """Test that entity columns are stored as categories"""
+        assert financial_data['entity'].dtype == 'category'
+        assert cash_data['entity'].dtype == 'category'
+        assert list(financial_data['source'].cat.categories) == ['actuals', 'budget']
+        assert financial_data['cat_type'].dtype == 'int8'
+        assert financial_data['year'].dtype == 'int16'
+        assert (financial_data['year'] == financial_data['month'].dt.year).all()
+        assert financial_data['month_ord'].dtype == 'int64'
+        assert (financial_data['month_ord'] == financial_data['month'].array.asi8).all()
+
+        by_cat = financial_data.groupby('account_category', observed=True)['cat_type'].first()
+        assert by_cat['Revenue'] == CAT_REV
+        assert by_cat['COGS'] == CAT_COGS
+        assert by_cat['Opex:Marketing'] == CAT_OPEX
+        assert set(by_cat.unique()) <= {CAT_REV, CAT_COGS, CAT_OPEX, CAT_OTHER}
+
+        opex = row_category_types(financial_data) == CAT_OPEX
+        assert opex.dtype == bool
+        assert (opex == financial_data['account_category'].astype(str).str.startswith('Opex:').to_numpy()).all()
+        raw = financial_data[['account_category']].astype(str)  # no cat_type column: classified on the fly
+        assert (row_category_types(raw) == financial_data['cat_type'].to_numpy()).all()
+
+        cols = category_columns(financial_data)
+        assert cols is category_columns(financial_data)
+        assert 'Opex:Marketing' in cols[CAT_OPEX]
+        assert all(str(c).startswith('Opex:') for c in cols[CAT_OPEX])
+    
+    def test_actuals_rows(self, financial_data):
+        """Test that the actuals partition is selected once per frame"""
+        actuals = actuals_rows(financial_data)
+        assert (actuals['source'] == 'actuals').all()
+        assert len(actuals) == (financial_data['source'] == 'actuals').sum()
+        assert actuals_rows(financial_data) is actuals
+
+    def test_month_totals(self, financial_data):
+        """Test the entity-summed (month, source) table built once per frame"""
+        totals = month_totals(financial_data)
+        assert list(totals.index.names) == ['month', 'source']
+        assert totals.index.is_unique
+        m = financial_data['month'].max()
+        rows = financial_data[(financial_data['month'] == m) & (financial_data['source'] == 'actuals')]
+        expected = rows.groupby('account_category', observed=True)['amount_usd'].sum()
+        for cat, amount in expected.items():
+            assert totals.loc[(m, 'actuals'), cat] == pytest.approx(amount)
+        assert month_totals(financial_data) is totals
+
+    def test_source_partitions(self, financial_data):
+        """Test the per-source partitions indexed by (account_category, month)"""
+        parts = source_partitions(financial_data)
+        assert set(parts) == {'actuals', 'budget'}
+        assert sum(len(p) for p in parts.values()) == len(financial_data)
+
+        actuals = parts['actuals']
+        assert actuals.index.names == ['account_category', 'month']
+        assert actuals.index.is_monotonic_increasing
+        marketing = actuals.loc['Opex:Marketing']
+        expected = financial_data[
+            (financial_data['source'] == 'actuals') & (financial_data['account_category'] == 'Opex:Marketing')
+        ]
+        assert marketing['amount_usd'].sum() == pytest.approx(expected['amount_usd'].sum())
+
     def test_get_available_months(self, financial_data):
         """Test getting available months from financial data"""
         months = get_available_months(financial_data)
@@ -57,6 +129,7 @@ class TestDataLoading:
         assert not months.empty
         assert months.dtype == 'period[M]'
         assert months.is_monotonic_increasing  # Should be sorted
+        assert get_available_months(financial_data) is months  # Computed once per frame
         
         # Check expected date range
         assert months.min() == pd.Period('2023-01', freq='M')
@@ -99,7 +172,26 @@ class TestDataIntegrity:
         # Check date continuity (should have consecutive months)
         months = cash_data['month'].sort_values().unique()
         assert len(months) == 36  # Expected 36 months of data
+
+    def test_cash_bounds(self, cash_data):
+        """Test the cached first/last cash balances"""
+        assert cash_data['month'].is_monotonic_increasing
+        start, end = cash_bounds(cash_data)
+        assert start == cash_data['amount_usd'].iloc[0]
+        assert end == cash_data['amount_usd'].iloc[-1]
+        assert cash_bounds(cash_data.iloc[:0]) == (0.0, 0.0)
     
+    def test_session_context(self, sample_data):
+        """Test the per-session derived values shared by the tools"""
+        fin, cash = sample_data
+        ctx = session_context(fin, cash)
+        assert ctx.months is get_available_months(fin)
+        assert ctx.actuals is actuals_rows(fin)
+        assert ctx.entity_names == tuple(sorted(fin['entity'].unique()))
+        assert (ctx.cash_start, ctx.cash_end) == cash_bounds(cash)
+        with pytest.raises(AttributeError):
+            ctx.cash_end = 0.0
+
     def test_currency_conversion(self, financial_data):
         """Test that currency conversion to USD worked correctly"""
         # All amounts should be in USD after normalization
@@ -5,3 +5,5 @@ def test_intent_classify():
     assert classify('Show gross margin % trend for the last 3 months') == 'gm_trend'
     assert classify('Break down Opex by category for June') == 'opex_breakdown'
     assert classify('What is our cash runway right now?') == 'cash_runway'
+    assert classify('How many months of data are here?') == 'data_coverage'
+    assert classify('Tell me a joke') == 'unknown'
@@ -1,5 +1,5 @@
 import pandas as pd
-from agent.metrics import revenue_month, gross_margin_pct_series, ebitda_series, cash_runway
+from agent.metrics import revenue_month, gross_margin_pct_series, opex_breakdown_month, ebitda_series, cash_runway
 
 def _toy_fin():
     # 2 months, simple totals
@@ -28,15 +28,54 @@ def test_revenue_month():
     assert a == 1200.0 and b == 1100.0
     assert round(dp,4) == round((1200-1100)/1100,4)
 
+def test_revenue_month_missing():
+    fin = _toy_fin()
+    a,b,delta,dp = revenue_month(fin, pd.Period('2024-01',freq='M'))
+    assert a == 0.0 and b == 0.0 and pd.isna(dp)
+
+def test_opex_breakdown():
+    fin = _toy_fin()
+    ser = opex_breakdown_month(fin, pd.Period('2025-06',freq='M'), entity='Co')
+    assert ser.to_dict() == {'Opex:Ops': 350.0}
+    assert opex_breakdown_month(fin, pd.Period('2025-06',freq='M'), entity='Other').empty
+
+def test_opex_breakdown_keeps_net_zero_category():
+    fin = _toy_fin()
+    extra = pd.DataFrame([
+        ['2025-06','Co','Opex:Travel', 120.0,'actuals'],
+        ['2025-06','Co','Opex:Travel',-120.0,'actuals'],
+    ], columns=fin.columns)
+    extra['month'] = pd.PeriodIndex(extra['month'], freq='M')
+    fin = pd.concat([fin, extra], ignore_index=True)
+    june = pd.Period('2025-06',freq='M')
+    assert opex_breakdown_month(fin, june).to_dict() == {'Opex:Ops': 350.0, 'Opex:Travel': 0.0}
+    assert opex_breakdown_month(fin, june, entity='Co').to_dict() == {'Opex:Ops': 350.0, 'Opex:Travel': 0.0}
+    # Zero-filled in the pivot but no rows in May: not listed
+    assert opex_breakdown_month(fin, pd.Period('2025-05',freq='M')).to_dict() == {'Opex:Ops': 300.0}
+
 def test_gm_pct():
     fin = _toy_fin()
     months = pd.PeriodIndex(['2025-05','2025-06'], freq='M')
     gm = gross_margin_pct_series(fin, months)
     assert round(gm.iloc[0],3) == round((1000-400)/1000,3)
 
+def test_ebitda_missing_months_and_entity():
+    fin = _toy_fin()
+    months = pd.PeriodIndex(['2025-04','2025-06'], freq='M')
+    e = ebitda_series(fin, months)
+    assert e.to_dict() == {pd.Period('2025-06',freq='M'): 1200.0 - 500.0 - 350.0}
+    assert ebitda_series(fin, pd.PeriodIndex(['2024-01'], freq='M')).empty
+    assert ebitda_series(fin, months, entity='Other').empty
+
 def test_runway():
     fin = _toy_fin(); cash = _toy_cash()
     months = pd.PeriodIndex(['2025-05','2025-06'], freq='M')
     e = ebitda_series(fin, months)
     r = cash_runway(cash, e.tail(2))
     assert r > 0
+
+def test_runway_with_burn():
+    cash = _toy_cash()
+    e = pd.Series([-200.0, 100.0, -400.0, -300.0])
+    # last 3 months burn 0, 400, 300 -> avg 233.33; latest cash 9800
+    assert round(cash_runway(cash, e), 4) == round(9800.0 / (700.0 / 3), 4)
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from agent.parser import parse_months, parse_target_period, scan_question
+
+AM = pd.Series(pd.period_range('2023-01', '2025-12', freq='M'))
+
+def _strs(sel):
+    return None if sel is None else [str(p) for p in sel]
+
+def test_parse_months_forms():
+    assert _strs(parse_months('What was June 2025 revenue vs budget?', AM)) == ['2025-06']
+    assert _strs(parse_months('Revenue for Q2 2025', AM)) == ['2025-04', '2025-05', '2025-06']
+    assert _strs(parse_months('revenue 2024/11', AM)) == ['2024-11']
+    assert _strs(parse_months('GM% for the last 3 months', AM)) == ['2025-10', '2025-11', '2025-12']
+    assert _strs(parse_months('Break down Opex for June', AM)) == ['2025-06']
+    assert _strs(parse_months('What is our cash runway right now?', AM)) == ['2025-12']
+    assert parse_months('no period here', AM) is None
+
+def test_parse_months_priority():
+    # "last N months" outranks an explicit month, whatever the word order
+    assert len(parse_months('Jan 2024 vs the last 12 months', AM)) == 12
+    # a quarter outranks a named month
+    assert _strs(parse_months('October 2024 and Q1 2025', AM)) == ['2025-01', '2025-02', '2025-03']
+
+def test_parse_months_month_like_words():
+    # "marketing 2025" is not "<month> <year>" (this used to raise from dateutil)
+    # the lone "mar" prefix still reads as March, so it resolves to the latest one
+    assert _strs(parse_months('marketing 2025', AM)) == ['2025-03']
+
+@pytest.mark.parametrize("question,expected", [
+    ("marketing spend in January 2025", (pd.Period("2025-01", freq="M"), 2025, 1)),
+    ("sales in Sept 2024", (pd.Period("2024-09", freq="M"), 2024, 9)),
+    ("revenue for 2024/05", (pd.Period("2024-05", freq="M"), 2024, 5)),
+    ("revenue for 2024-13", (None, 2024, None)),
+    ("revenue in 2025", (None, 2025, None)),
+    ("total revenue", (None, None, None)),
+    (None, (None, None, None)),
+])
+def test_parse_target_period(question, expected):
+    assert parse_target_period(question) == expected
+
+@pytest.mark.parametrize("question,category", [
+    ("how much did we spend on sales and marketing?", "Marketing"),
+    ("Sales spend in March 2025", "Sales"),
+    ("R&D and admin costs", "R&D"),
+    ("administration overhead", "Admin"),
+    ("total opex", None),
+])
+def test_scan_question_category(question, category):
+    assert scan_question(question)[0] == category
+
+def test_scan_question_is_cached():
+    question = "marketing spend in March 2025"
+    assert scan_question(question) is scan_question(question)
@@ -0,0 +1,123 @@
+"""
+Tests for the RAG knowledge base and query-embedding cache (no network calls)
+"""
+
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from agent import rag
+
+
+class TestQueryCache:
+    """Test that repeated questions skip the embedding call"""
+
+    def test_repeated_query_embeds_once(self, sample_data, fake_embed):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+        fake_embed.clear()
+
+        first = rag.retrieve(kb, 'What is our cash runway right now?', k=2)
+        second = rag.retrieve(kb, 'what is our cash runway right now', k=2)
+
+        assert first == second
+        assert fake_embed == [['What is our cash runway right now?']]
+
+    def test_distinct_queries_are_embedded(self, sample_data, fake_embed):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+        fake_embed.clear()
+
+        rag.retrieve(kb, 'revenue vs budget', k=1)
+        rag.retrieve(kb, 'opex breakdown', k=1)
+
+        assert len(fake_embed) == 2
+
+    def test_cache_is_bounded(self, fake_embed, monkeypatch):
+        monkeypatch.setattr(rag, "_QUERY_CACHE_SIZE", 2)
+
+        rag.embed_query('revenue')
+        rag.embed_query('budget')
+        rag.embed_query('revenue')  # refreshes 'revenue'
+        rag.embed_query('opex')
+
+        assert list(rag._QUERY_CACHE) == [rag._query_key('revenue'), rag._query_key('opex')]
+
+    def test_cache_round_trips_without_pickle(self, fake_embed, monkeypatch, tmp_path):
+        path = tmp_path / 'queries.cache'
+        monkeypatch.setattr(rag, "_QUERY_CACHE_PATH", str(path))
+        vec = rag.embed_query('cash runway')
+        rag._save_query_cache()
+
+        assert path.exists()
+        with np.load(path, allow_pickle=False) as saved:
+            assert saved['keys'].dtype.kind == 'U'
+        loaded = rag._load_query_cache()
+        assert list(loaded) == [rag._query_key('cash runway')]
+        assert np.array_equal(loaded[rag._query_key('cash runway')], vec)
+
+    def test_cache_not_persisted_when_unset(self, fake_embed, monkeypatch, tmp_path):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(rag, "_QUERY_CACHE_PATH", None)
+        rag.embed_query('cash runway')
+        rag._save_query_cache()
+
+        assert list(tmp_path.iterdir()) == []
+        assert rag._load_query_cache() == OrderedDict()
+
+    def test_pickled_cache_file_is_ignored(self, monkeypatch, tmp_path):
+        path = tmp_path / 'queries.pkl'
+        path.write_bytes(pickle.dumps({'k': np.zeros(8)}))
+        monkeypatch.setattr(rag, "_QUERY_CACHE_PATH", str(path))
+
+        assert rag._load_query_cache() == OrderedDict()
+
+
+class TestKnowledgeBase:
+    """Test KB persistence and batched retrieval"""
+
+    def test_kb_embeddings_reused_from_disk(self, sample_data, fake_embed):
+        fin, cash = sample_data
+        first = rag.build_kb(fin, cash)
+        second = rag.build_kb(fin, cash)
+
+        assert len(fake_embed) == 1
+        assert np.array_equal(first['embs'], second['embs'])
+
+    def test_schema_doc_lists_only_source_columns(self, sample_data, fake_embed):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+
+        assert "Dataset schema (financials): account_category, amount_usd, entity, month, source" in kb['docs']
+
+    def test_kb_not_persisted_when_unset(self, sample_data, fake_embed, monkeypatch, tmp_path):
+        monkeypatch.setattr(rag, "_KB_CACHE_DIR", None)
+        fin, cash = sample_data
+        rag.build_kb(fin, cash)
+        rag.build_kb(fin, cash)
+
+        assert len(fake_embed) == 2
+        assert list(tmp_path.iterdir()) == []
+
+    def test_retrieve_batch_matches_retrieve(self, sample_data, fake_embed):
+        fin, cash = sample_data
+        kb = rag.build_kb(fin, cash)
+        fake_embed.clear()
+
+        questions = ['revenue vs budget', 'cash runway', 'revenue vs budget']
+        batched = rag.retrieve_batch(kb, questions, k=3)
+
+        assert fake_embed == [['revenue vs budget', 'cash runway']]
+        assert batched == [rag.retrieve(kb, q, k=3) for q in questions]
+
+    def test_int8_kb_ranks_like_fp32(self, sample_data, fake_embed, monkeypatch):
+        fin, cash = sample_data
+        kb32 = rag.build_kb(fin, cash)
+        monkeypatch.setattr(rag, "_KB_INT8", True)
+        kb8 = rag.build_kb(fin, cash)
+
+        assert 'embs' not in kb8 and kb8['embs_q'].dtype == np.int8
+        for q in ['revenue vs budget', 'cash runway', 'opex breakdown by category']:
+            assert rag.retrieve(kb8, q, k=1) == rag.retrieve(kb32, q, k=1)
@@ -9,8 +9,12 @@ from agent.tools import (
     tool_financial_performance,
     tool_gm_trend,
     tool_cash_runway,
-    tool_data_coverage
+    tool_data_coverage,
+    dispatch,
+    TOOL_SPECS,
 )
+import json
+import pandas as pd
 
 
 class TestToolRouting:
@@ -103,4 +107,45 @@ class TestErrorHandling:
         # Test with non-existent expense category
         result = tool_opex_breakdown(fin, cash, 'how much is spent on invalid_category?', None)
         # Should fall back to general opex breakdown
-        assert 'answer' in result
\ No newline at end of file
+        assert 'answer' in result
+
+
+class TestDispatch:
+    """Test routing tool names to implementations"""
+
+    def test_every_tool_spec_dispatches(self, sample_data):
+        fin, cash = sample_data
+        for spec in TOOL_SPECS:
+            result = dispatch(spec["name"], {}, fin, cash, "revenue in 2025", None)
+            assert result["answer"] != "Unknown tool requested."
+
+    def test_unknown_tool(self, sample_data):
+        fin, cash = sample_data
+        assert dispatch("nope", {}, fin, cash, "revenue", None) == {"answer": "Unknown tool requested."}
+
+
+class TestChartPayloads:
+    """Test the chart point payloads returned by the tools"""
+
+    def test_results_are_json_serializable(self, sample_data):
+        fin, cash = sample_data
+        questions = ['gross margin for the last 3 months', 'marketing spend in 2024',
+                     'opex breakdown June 2025', 'revenue in 2025', 'cash runway']
+        for spec in TOOL_SPECS:
+            for q in questions:
+                result = dispatch(spec["name"], {}, fin, cash, q, None)
+                assert json.loads(json.dumps(result)) == result
+
+    def test_points_are_plain_records(self, sample_data):
+        fin, cash = sample_data
+        result = tool_opex_breakdown(fin, cash, 'marketing spend in 2024', None)
+        data = result['chart']['payload']['data']
+        assert type(data) is list
+        assert all(type(p) is dict and type(p["amount"]) is float for p in data)
+
+    def test_tool_payload(self, sample_data):
+        fin, cash = sample_data
+        result = tool_gm_trend(fin, cash, 'gross margin for the last 3 months', None)
+        points = result['chart']['payload']['points']
+        assert len(points) == 3
+        assert all(set(p) == {"month", "gm_pct"} for p in points)